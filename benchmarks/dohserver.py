@@ -0,0 +1,158 @@
+"""
+A local RFC 8484 DoH (DNS-over-HTTPS) server for benchmarks
+
+Every name under ``zone`` is resolved to ``address`` (A) and optionally
+``address6`` (AAAA), names outside of it return NXDOMAIN.
+Latency, jitter, loss and TTL of the answers can be configured.
+"""
+
+import base64
+import random
+import socket
+import threading
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+__all__ = ('DoHServer',)
+
+class _DoHRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle's algorithm
+    # and delayed ACK add latency to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _answer(self, wire):
+        config = self.server.doh
+
+        with config._lock:
+            config.queries += 1
+
+        if config.latency or config.jitter:
+            time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+
+        if config.loss and random.random() < config.loss:
+            # Simulate a lost query by dropping the connection without response
+            with config._lock:
+                config.dropped += 1
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+
+        query = dns.message.from_wire(wire)
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name
+
+        if not name.is_subdomain(config.zone):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            response.authority.append(dns.rrset.from_text(
+                config.zone, config.ttl, "IN", "SOA",
+                "ns.%s hostmaster.%s 1 3600 600 86400 %d" % (config.zone, config.zone, config.ttl)
+            ))
+        elif question.rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(name, config.ttl, "IN", "A", config.address))
+        elif question.rdtype == dns.rdatatype.AAAA and config.address6 is not None:
+            response.answer.append(dns.rrset.from_text(name, config.ttl, "IN", "AAAA", config.address6))
+
+        body = response.to_wire()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/dns-message")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "max-age=%d" % config.ttl)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._answer(self.rfile.read(length))
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        try:
+            data = query["dns"][0]
+        except KeyError:
+            self.send_error(400)
+            return
+
+        self._answer(base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)))
+
+class DoHServer:
+    """A local DoH server running in a background thread
+
+    Parameters
+    -----------
+    zone: :class:`str`
+        Every name under this zone is resolved
+    address: :class:`str`
+        IPv4 address returned for A queries
+    address6: :class:`str`
+        IPv6 address returned for AAAA queries, if it's ``None``
+        AAAA queries return no answers
+    latency: :class:`float`
+        Delay in seconds before each query is answered
+    jitter: :class:`float`
+        Random delay in seconds added to or subtracted from ``latency``
+    loss: :class:`float`
+        Probability (0.0 - 1.0) of a query being dropped
+    ttl: :class:`int`
+        TTL of the answers
+    """
+    def __init__(
+        self,
+        zone="bench.test.",
+        address="127.0.0.1",
+        address6=None,
+        latency=0.0,
+        jitter=0.0,
+        loss=0.0,
+        ttl=300
+    ):
+        self.zone = dns.name.from_text(zone)
+        self.address = address
+        self.address6 = address6
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.ttl = ttl
+
+        # Number of received and dropped queries
+        self.queries = 0
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d/dns-query" % (host, port)
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _DoHRequestHandler)
+        self._server.daemon_threads = True
+        self._server.doh = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
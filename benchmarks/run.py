@@ -0,0 +1,329 @@
+"""
+Benchmarks of requests-doh against a local DoH server
+
+Usage::
+
+    python benchmarks/run.py --latency 0.02 --jitter 0.005 --output results.json
+    python benchmarks/run.py --compare results.json
+
+Results are written as JSON, so runs of different versions can be compared
+with ``--compare``.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Benchmark the checked out source, not the installed one
+sys.path.insert(0, os.path.dirname(HERE))
+
+import dns.version
+import requests_doh
+from requests_doh import DNSOverHTTPSSession, DNSCacheManager, Resolver
+
+from dohserver import DoHServer
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return None
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p99": percentile(0.99),
+        "max": samples[-1],
+    }
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=HERE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _create_resolver(server):
+    return Resolver(
+        provider="bench",
+        providers={"bench": server.url},
+        cache=DNSCacheManager()
+    )
+
+def _prime(resolver, hosts, attempts=10):
+    """Cache ``hosts``, retrying queries dropped by the DoH server"""
+    for host in hosts:
+        for attempt in range(attempts):
+            try:
+                resolver._get_answers(host)
+            except Exception:
+                if attempt == attempts - 1:
+                    raise
+            else:
+                break
+
+class _HTTPRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle's algorithm
+    # and delayed ACK add latency to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+def bench_cold(server, hosts):
+    """Latency of resolving hosts that aren't cached"""
+    resolver = _create_resolver(server)
+    samples = []
+    errors = 0
+    for index in range(hosts):
+        start = time.perf_counter()
+        try:
+            resolver._get_answers("cold-%d.%s" % (index, server.zone))
+        except Exception:
+            errors += 1
+            continue
+        samples.append(time.perf_counter() - start)
+
+    result = _percentiles(samples) or {}
+    result["errors"] = errors
+    return result
+
+def bench_warm(server, iterations):
+    """Latency of resolving a cached host"""
+    resolver = _create_resolver(server)
+    host = "warm.%s" % server.zone
+    _prime(resolver, [host])
+
+    get_answers = resolver._get_answers
+    samples = []
+    # Single lookups are too fast to time precisely, time them in batches
+    batch = 100
+    for _ in range(max(1, iterations // batch)):
+        start = time.perf_counter()
+        for _ in range(batch):
+            get_answers(host)
+        samples.append((time.perf_counter() - start) / batch)
+
+    return _percentiles(samples)
+
+def bench_connections(server, duration):
+    """Connections per second through :class:`DNSOverHTTPSSession`"""
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), _HTTPRequestHandler)
+    http_server.daemon_threads = True
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+
+    resolver = _create_resolver(server)
+    session = DNSOverHTTPSSession(resolver=resolver)
+    host = "conn.%s" % str(server.zone).rstrip(".")
+    url = "http://%s:%d/" % (host, http_server.server_address[1])
+    _prime(resolver, [host])
+
+    # Every request opens a new connection, so the connect path
+    # (create_connection and DNS cache lookup) is measured
+    headers = {"Connection": "close"}
+
+    connections = 0
+    errors = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        try:
+            session.get(url, headers=headers)
+        except Exception:
+            errors += 1
+        else:
+            connections += 1
+    elapsed = time.perf_counter() - start
+
+    session.close()
+    http_server.shutdown()
+    http_server.server_close()
+
+    return {
+        "connections": connections,
+        "errors": errors,
+        "connections_per_second": connections / elapsed,
+    }
+
+def bench_threads(server, thread_counts, iterations):
+    """Throughput of cached lookups with multiple threads"""
+    resolver = _create_resolver(server)
+    hosts = ["thread-%d.%s" % (i, server.zone) for i in range(64)]
+    _prime(resolver, hosts)
+
+    results = {}
+    for count in thread_counts:
+        barrier = threading.Barrier(count + 1)
+        per_thread = max(1, iterations // count)
+
+        def worker(offset):
+            get_answers = resolver._get_answers
+            barrier.wait()
+            for i in range(per_thread):
+                get_answers(hosts[(offset + i) % len(hosts)])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        results[str(count)] = {
+            "lookups": per_thread * count,
+            "lookups_per_second": per_thread * count / elapsed,
+        }
+
+    return results
+
+def bench_memory(hosts):
+    """Memory used by each cached host"""
+    cache = DNSCacheManager()
+    names = ["memory-%d.bench.test" % i for i in range(hosts)]
+    answers = ["192.0.2.1", "2001:db8::1"]
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for name in names:
+        cache.set_cache(name, answers)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "hosts": hosts,
+        "bytes": after - before,
+        "bytes_per_host": (after - before) / hosts,
+    }
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(baseline, current):
+    """Print relative change of every numeric result"""
+    old = _flatten(baseline["results"])
+    new = _flatten(current["results"])
+
+    print("%-60s %14s %14s %9s" % ("benchmark", "baseline", "current", "change"))
+    for name in sorted(old.keys() & new.keys()):
+        change = "" if not old[name] else "%+8.1f%%" % ((new[name] - old[name]) / old[name] * 100)
+        print("%-60s %14.6g %14.6g %9s" % (name, old[name], new[name], change))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of requests-doh")
+    parser.add_argument("--latency", type=float, default=0.0, help="DoH server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="DoH server latency jitter in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="Probability of dropped DoH queries")
+    parser.add_argument("--ttl", type=int, default=300, help="TTL of DNS answers")
+    parser.add_argument("--ipv6", action="store_true", help="Answer AAAA queries with ::1")
+    parser.add_argument("--cold-hosts", type=int, default=200, help="Number of uncached hosts to resolve")
+    parser.add_argument("--iterations", type=int, default=100000, help="Number of cached lookups")
+    parser.add_argument("--duration", type=float, default=3.0, help="Duration of connections benchmark in seconds")
+    parser.add_argument("--threads", default="1,2,4,8", help="Comma separated thread counts")
+    parser.add_argument("--memory-hosts", type=int, default=10000, help="Number of hosts in memory benchmark")
+    parser.add_argument("--only", help="Comma separated benchmarks to run (cold, warm, connections, threads, memory)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare results with this JSON file")
+    args = parser.parse_args(argv)
+
+    selected = set(args.only.split(",")) if args.only else {"cold", "warm", "connections", "threads", "memory"}
+    config = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "loss": args.loss,
+        "ttl": args.ttl,
+        "ipv6": args.ipv6,
+        "cold_hosts": args.cold_hosts,
+        "iterations": args.iterations,
+        "duration": args.duration,
+        "threads": [int(i) for i in args.threads.split(",")],
+        "memory_hosts": args.memory_hosts,
+    }
+
+    server = DoHServer(
+        address6="::1" if args.ipv6 else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        ttl=args.ttl
+    )
+
+    results = {}
+    with server:
+        if "cold" in selected:
+            results["cold"] = bench_cold(server, args.cold_hosts)
+        if "warm" in selected:
+            results["warm"] = bench_warm(server, args.iterations)
+        if "connections" in selected:
+            results["connections"] = bench_connections(server, args.duration)
+        if "threads" in selected:
+            results["threads"] = bench_threads(server, config["threads"], args.iterations)
+
+    if "memory" in selected:
+        results["memory"] = bench_memory(args.memory_hosts)
+
+    report = {
+        "version": requests_doh.__version__,
+        "revision": _git_revision(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "dnspython": dns.version.version,
+        "config": config,
+        "server": {"queries": server.queries, "dropped": server.dropped},
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,6 @@ from .session import *
 from .adapter import *
 from .resolver import *
 from .exceptions import *
-from .cachemanager import *
\ No newline at end of file
+from .cachemanager import *
+from .metrics import *
+from .hosts import *
\ No newline at end of file
@@ -10,17 +10,51 @@ from .connector.default import (
     DoHHTTPSConnection,
 )
 
-from .cachemanager import set_dns_cache_expire_time
-
 from .connector.proxies import (
     SOCKSConnection,
     SOCKSHTTPSConnection
 )
 
-from .resolver import set_dns_provider
+from .resolver import get_default_resolver
+from .addrselect import to_sockaddrs
+from .health import AddressHealth
 
 __all__ = ('DNSOverHTTPSAdapter',)  
 
+class _BootstrapResolver:
+    """Resolve DoH provider hostname to its bootstrap addresses"""
+    def __init__(self, addresses):
+        self.sockaddrs = to_sockaddrs(addresses)[0]
+        # Bootstrap addresses are not rotated, DoH connections are reused anyway
+        self.address_health = AddressHealth(rotate=False)
+
+    def _get_sockaddrs(self, host):
+        return self.sockaddrs
+
+class _BootstrapAdapter(HTTPAdapter):
+    """Adapter for DoH queries, connections are made to 
+    bootstrap addresses of DoH provider while SNI and certificate
+    are still validated against its hostname"""
+    def __init__(self, addresses, happy_eyeballs_delay=0.25, **kwargs):
+        self._resolver = _BootstrapResolver(addresses)
+        self._happy_eyeballs_delay = happy_eyeballs_delay
+
+        super().__init__(**kwargs)
+
+    def get_connection(self, url, proxies=None):
+        conn = super().get_connection(url, proxies)
+        if isinstance(conn, (SOCKSHTTPSConnectionPool, SOCKSHTTPConnectionPool)):
+            # Proxy resolves DoH provider hostname
+            return conn
+
+        if isinstance(conn, HTTPSConnectionPool):
+            conn.ConnectionCls = DoHHTTPSConnection
+        else:
+            conn.ConnectionCls = DoHHTTPConnection
+        conn.conn_kw["resolver"] = self._resolver
+        conn.conn_kw["happy_eyeballs_delay"] = self._happy_eyeballs_delay
+        return conn
+
 class DNSOverHTTPSAdapter(HTTPAdapter):
     """An DoH (DNS over HTTPS) adapter for :class:`requests.Session`
     
@@ -28,29 +62,65 @@ class DNSOverHTTPSAdapter(HTTPAdapter):
     -----------
     provider: :class:`str`
         A DoH provider
+    resolver: :class:`Resolver`
+        A DoH resolver, if it's ``None`` the default resolver will be used. 
+        ``provider``, ``cache_expire_time`` and ``cache_file`` parameters 
+        will be applied to this resolver
     cache_expire_time: :class:`float`
-        Set DNS cache expire time
+        Maximum time in seconds DNS answers are cached,
+        see :func:`set_dns_cache_expire_time`
+    cache_file: :class:`str`
+        Store DNS cache in this file, see :func:`set_dns_cache_file`
+    happy_eyeballs: :class:`bool`
+        If ``True``, connection attempts to the resolved addresses of a host 
+        will be raced with Happy Eyeballs (RFC 8305) algorithm, 
+        and the first one that is connected will be used
+    happy_eyeballs_delay: :class:`float`
+        Delay in seconds between each staggered connection attempt 
+        when ``happy_eyeballs`` is enabled, default to 0.25 seconds
     **kwargs
         These parameters will be passed to :class:`requests.adapters.HTTPAdapter`
     """
-    def __init__(self, provider=None, cache_expire_time=None, **kwargs):
+    def __init__(
+        self,
+        provider=None,
+        cache_expire_time=None,
+        cache_file=None,
+        happy_eyeballs=False,
+        happy_eyeballs_delay=0.25,
+        resolver=None,
+        **kwargs
+    ):
+        if resolver is None:
+            resolver = get_default_resolver()
+
         if provider:
-            set_dns_provider(provider)
+            resolver.set_provider(provider)
 
         if cache_expire_time:
-            set_dns_cache_expire_time(cache_expire_time)
+            resolver.cache.set_expire_time(cache_expire_time)
+
+        if cache_file:
+            resolver.cache.set_cache_file(cache_file)
+
+        self.resolver = resolver
+
+        self._happy_eyeballs_delay = happy_eyeballs_delay if happy_eyeballs else None
 
         super().__init__(**kwargs)
 
     def get_connection(self, url, proxies=None):
         conn = super().get_connection(url, proxies)
+        conn.conn_kw["resolver"] = self.resolver
         if isinstance(conn, SOCKSHTTPSConnectionPool):
             conn.ConnectionCls = SOCKSHTTPSConnection
         elif isinstance(conn, SOCKSHTTPConnectionPool):
             conn.ConnectionCls = SOCKSConnection
         elif isinstance(conn, HTTPSConnectionPool):
             conn.ConnectionCls = DoHHTTPSConnection
+            conn.conn_kw["happy_eyeballs_delay"] = self._happy_eyeballs_delay
         else:
             # HTTP type
             conn.ConnectionCls = DoHHTTPConnection
+            conn.conn_kw["happy_eyeballs_delay"] = self._happy_eyeballs_delay
         return conn
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Parsing of resolved addresses and destination address selection (RFC 6724 section 6)
+"""
+
+import socket
+import ipaddress
+
+__all__ = ('sort_addresses', 'to_sockaddrs')
+
+# Default policy table (RFC 6724 section 2.1), (prefix, precedence, label)
+_POLICY_TABLE = tuple(
+    (ipaddress.IPv6Network(prefix), precedence, label)
+    for prefix, precedence, label in (
+        ("::1/128", 50, 0),
+        ("::ffff:0:0/96", 35, 4),
+        ("2002::/16", 30, 2),
+        ("2001::/32", 5, 5),
+        ("fc00::/7", 3, 13),
+        ("::/96", 1, 3),
+        ("fec0::/10", 1, 11),
+        ("3ffe::/16", 1, 12),
+        ("::/0", 40, 1),
+    )
+)
+
+_SCOPE_LINK_LOCAL = 0x2
+_SCOPE_SITE_LOCAL = 0x5
+_SCOPE_GLOBAL = 0xe
+
+def _to_ipv6(address):
+    if address.version == 4:
+        return ipaddress.IPv6Address("::ffff:" + str(address))
+
+    return address
+
+def _policy(address):
+    address = _to_ipv6(address)
+    for network, precedence, label in _POLICY_TABLE:
+        if address in network:
+            return precedence, label
+
+    # Unreachable, "::/0" matches everything
+    return 40, 1
+
+def _scope(address):
+    if address.version == 4:
+        # IPv4 loopback and auto-configuration addresses are link-local (RFC 6724 section 3.2)
+        if address.is_loopback or address.is_link_local:
+            return _SCOPE_LINK_LOCAL
+        return _SCOPE_GLOBAL
+
+    if address.is_multicast:
+        return address.packed[1] & 0x0f
+    if address.is_loopback or address.is_link_local:
+        return _SCOPE_LINK_LOCAL
+    if address.is_site_local:
+        return _SCOPE_SITE_LOCAL
+    return _SCOPE_GLOBAL
+
+def _common_prefix_len(a, b):
+    # Compared up to the length of the prefix (64 bits), not the interface identifier
+    diff = (int.from_bytes(a.packed, "big") ^ int.from_bytes(b.packed, "big")) >> 64
+    return 64 - diff.bit_length()
+
+def _source_address(address):
+    """Return source address that the kernel would use to reach ``address``,
+    ``None`` if it's unreachable"""
+    family = socket.AF_INET if address.version == 4 else socket.AF_INET6
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            # Connecting UDP socket doesn't send any packets
+            sock.connect((str(address), 9))
+            return ipaddress.ip_address(sock.getsockname()[0].split("%", 1)[0])
+    except (OSError, ValueError):
+        return None
+
+class _SortKey:
+    __slots__ = ('value', 'address', 'source', 'scope', 'precedence', 'label', 'index')
+
+    def __init__(self, value, address, index):
+        self.value = value
+        self.address = address
+        self.source = _source_address(address)
+        self.scope = _scope(address)
+        self.precedence, self.label = _policy(address)
+        self.index = index
+
+    def __lt__(self, other):
+        # Rule 1: Avoid unusable destinations
+        if (self.source is None) != (other.source is None):
+            return other.source is None
+
+        if self.source is not None and other.source is not None:
+            # Rule 2: Prefer matching scope
+            self_match = self.scope == _scope(self.source)
+            other_match = other.scope == _scope(other.source)
+            if self_match != other_match:
+                return self_match
+
+            # Rule 5: Prefer matching label
+            self_match = self.label == _policy(self.source)[1]
+            other_match = other.label == _policy(other.source)[1]
+            if self_match != other_match:
+                return self_match
+
+        # Rule 6: Prefer higher precedence
+        if self.precedence != other.precedence:
+            return self.precedence > other.precedence
+
+        # Rule 8: Prefer smaller scope
+        if self.scope != other.scope:
+            return self.scope < other.scope
+
+        # Rule 9: Use longest matching prefix, only for IPv6 addresses
+        # because it breaks round-robin DNS of IPv4 addresses (same as Go)
+        if (
+            self.source is not None
+            and other.source is not None
+            and self.address.version == other.address.version == 6
+        ):
+            self_len = _common_prefix_len(self.address, self.source)
+            other_len = _common_prefix_len(other.address, other.source)
+            if self_len != other_len:
+                return self_len > other_len
+
+        # Rule 10: Otherwise, leave the order unchanged
+        return self.index < other.index
+
+def sort_addresses(addresses):
+    """Sort IP addresses by RFC 6724 destination address selection rules,
+    addresses that are equal by the rules keep their original order.
+    Values that are not IP addresses are kept at the end.
+
+    Rules 3, 4 and 7 need information about source addresses that is not
+    available from the socket API, so they're skipped.
+    """
+    keys = []
+    others = []
+    for index, address in enumerate(addresses):
+        try:
+            keys.append(_SortKey(address, ipaddress.ip_address(address), index))
+        except ValueError:
+            others.append(address)
+
+    keys.sort()
+    return [key.value for key in keys] + others
+
+def to_sockaddrs(answers):
+    """Split ``answers`` into ``(family, sockaddr)`` tuples of IP addresses
+    and other answers (like CNAME targets).
+
+    Port of the sockaddrs is 0, replace it before connecting.
+    """
+    sockaddrs = []
+    others = []
+    for answer in answers:
+        try:
+            if ":" not in answer:
+                socket.inet_pton(socket.AF_INET, answer)
+                sockaddrs.append((socket.AF_INET, (answer, 0)))
+            elif "%" in answer:
+                # Scoped IPv6 address, let libc resolve the interface name
+                addrinfo = socket.getaddrinfo(
+                    answer, 0, socket.AF_INET6, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST
+                )[0]
+                sockaddrs.append((socket.AF_INET6, addrinfo[4]))
+            else:
+                socket.inet_pton(socket.AF_INET6, answer)
+                sockaddrs.append((socket.AF_INET6, (answer, 0, 0, 0)))
+        except (OSError, UnicodeError):
+            others.append(answer)
+
+    return tuple(sockaddrs), tuple(others)
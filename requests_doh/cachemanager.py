@@ -1,60 +1,889 @@
-from datetime import datetime, timedelta
+import os
+import sys
+import socket
+import copy
+import asyncio
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time as _now
+from collections import OrderedDict
 
-__all__ = ('set_dns_cache_expire_time', 'purge_dns_cache', 'cachemanager')
+from .exceptions import DNSQueryFailed
+from .metrics import metrics
+from .addrselect import to_sockaddrs
+
+__all__ = (
+    'DNSCacheManager', 'set_dns_cache_expire_time', 'set_dns_cache_ttl_bounds',
+    'set_dns_cache_host_expire_time', 'set_dns_cache_max_size',
+    'set_dns_cache_stale_time', 'set_dns_cache_prefetch',
+    'set_dns_cache_negative_ttl', 'set_dns_cache_file',
+    'purge_dns_cache', 'cachemanager'
+)
+
+log = logging.getLogger(__name__)
+
+# Expire time of DNS answers that have no TTL, if expire time is not set
+_DEFAULT_EXPIRE_TIME = 300
+
+# Maximum number of CNAME links followed from a host, protects against CNAME loops
+_MAX_CNAME_CHAIN = 16
+
+def _link_size(alias, link):
+    return sys.getsizeof(alias) + sys.getsizeof(link) + sum(sys.getsizeof(i) for i in link)
+
+def _check_time(time):
+    if not (isinstance(time, float) or isinstance(time, int)):
+        raise ValueError(f'{time.__class__.__name__} is not float type')
+
+def _retrieve_exception(task):
+    # Nobody may be waiting for the task anymore (all of them are cancelled)
+    if not task.cancelled():
+        task.exception()
+
+class _InflightQuery:
+    """A DNS query that is currently running, 
+    other threads that want the same host wait for its result"""
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+
+        return self._result
+
+class _PersistentStore:
+    """DNS cache stored in sqlite database, 
+    it can be read and written by multiple processes at the same time"""
+    def __init__(self, path):
+        self.path = path
+        self._open()
+        with self._lock, self._conn:
+            # WAL mode allows readers and a writer from different processes
+            # to work at the same time
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dns_cache ("
+                "host TEXT PRIMARY KEY, expire REAL NOT NULL, answers TEXT NOT NULL)"
+            )
+
+    def _open(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+
+    def _check_fork(self):
+        # sqlite connections must not be used across fork(),
+        # the child process opens its own connection (and lock, it may be held by another thread)
+        if self._pid != os.getpid():
+            self._open()
+
+    def load(self):
+        self._check_fork()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT host, expire, answers FROM dns_cache WHERE expire > ?", (_now(),)
+            ).fetchall()
+
+        return [(host, expire, tuple(answers.split())) for host, expire, answers in rows]
+
+    def get(self, host):
+        self._check_fork()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expire, answers FROM dns_cache WHERE host = ? AND expire > ?",
+                (host, _now())
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        expire, answers = row
+        return expire, tuple(answers.split())
+
+    def set(self, host, expire, answers):
+        self._check_fork()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dns_cache (host, expire, answers) VALUES (?, ?, ?)",
+                (host, expire, " ".join(answers))
+            )
+
+    def delete(self, host):
+        """Delete ``host`` and return ``True`` if it was stored"""
+        self._check_fork()
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM dns_cache WHERE host = ?", (host,))
+            return cursor.rowcount > 0
+
+    def clear(self):
+        self._check_fork()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM dns_cache")
+
+    def close(self):
+        if self._pid != os.getpid():
+            # Connection of the parent process, leave it to the parent
+            return
+
+        with self._lock:
+            self._conn.close()
+
+class _CacheEntry:
+    __slots__ = ('expire', 'lifetime', 'addresses', 'error', 'referenced', 'hits')
+
+    def __init__(self, lifetime, answers, error=None):
+        self.expire = _now() + lifetime
+        self.lifetime = lifetime
+        # Only parsed socket addresses are stored (without their address family, 
+        # it's known from their length), so connections don't parse the answers again
+        self.addresses = tuple(sockaddr for _, sockaddr in to_sockaddrs(answers)[0])
+        self.error = error
+        self.referenced = False
+        self.hits = 0
+
+    @property
+    def sockaddrs(self):
+        return tuple(
+            (socket.AF_INET if len(sockaddr) == 2 else socket.AF_INET6, sockaddr)
+            for sockaddr in self.addresses
+        )
+
+    @property
+    def answers(self):
+        return tuple(sockaddr[0] for sockaddr in self.addresses)
+
+def _entry_size(host, entry):
+    # Computed again when the entry is removed instead of storing it in every entry
+    return (
+        sys.getsizeof(host)
+        + sys.getsizeof(entry)
+        + sys.getsizeof(entry.addresses)
+        + sum(sys.getsizeof(i) + sys.getsizeof(i[0]) for i in entry.addresses)
+    )
 
 class DNSCacheManager:
+    """Thread-safe and bounded DNS cache
+
+    Reading the cache is lock-free (a single dict lookup is atomic),
+    while writes are serialized with a lock.
+
+    When the cache is full, entries are evicted in LRU order using
+    second-chance algorithm, an entry that has been read since it was inserted
+    (or since its last chance) is moved back to the end of the queue instead of evicted.
+
+    Optionally, expired entries can be served while they're refreshed in background 
+    (stale-while-revalidate) and frequently used entries can be refreshed in background 
+    shortly before they're expired (prefetch).
+
+    Failed DNS queries (NXDOMAIN, SERVFAIL, empty answers) can be cached too (RFC 2308),
+    cached failures are raised again without querying DoH provider.
+
+    If a cache file is set, resolved answers are also written to it with their absolute
+    expire time, so other processes (or the next run) can use them.
+
+    CNAME links (alias -> target) are cached separately from the answers with their own TTL,
+    so an alias can be resolved from the cached answers of its target.
+    Purging a target also purges answers of the aliases that point to it.
+    """
     def __init__(self):
-        self._expire = timedelta(seconds=300)
-        self._data = {}
+        # Explicitly set expire time, it caps TTLs returned from DoH provider
+        self._expire = None
+        self._min_ttl = 0
+        self._max_ttl = None
+        self._max_entries = None
+        self._max_bytes = None
+        self._stale_time = 0
+        self._prefetch_hits = None
+        self._prefetch_ratio = 0.1
+        self._negative_ttl = None
+        self._max_negative_ttl = None
+        self._executor = None
+        self._store = None
+        self._host_expire = {}
+        self._data = OrderedDict()
+        self._size = 0
+        self._evictions = 0
+        self._inflight = {}
+        self._inflight_async = {}
+        # Alias -> (target, expire time) and target -> set of its aliases,
+        # links are counted in the cache size and evicted in insertion order
+        self._cnames = OrderedDict()
+        self._aliases = {}
+        self._lock = threading.Lock()
     
     def set_expire_time(self, time):
-        if isinstance(time, float) or isinstance(time, int):        
-            self._expire = timedelta(seconds=time)
-        else:
-            raise ValueError(f'{time.__class__.__name__} is not float type')
-    
-    def set_cache(self, host, answers):
-        self._data[host] = {
-            "expire": datetime.now() + self._expire,
-            "data": answers
-        }
-    
-    def get_cache(self, host):
+        if time is not None:
+            _check_time(time)
+        self._expire = time
+
+    def set_stale_time(self, time):
+        _check_time(time)
+        self._stale_time = time
+
+    def set_prefetch(self, min_hits, ratio=0.1):
+        if min_hits is not None and not isinstance(min_hits, int):
+            raise ValueError(f'{min_hits.__class__.__name__} is not int type')
+        _check_time(ratio)
+
+        self._prefetch_hits = min_hits
+        self._prefetch_ratio = ratio
+
+    def set_negative_ttl(self, time, max_ttl=None):
+        if time is not None:
+            _check_time(time)
+        if max_ttl is not None:
+            _check_time(max_ttl)
+
+        self._negative_ttl = time
+        self._max_negative_ttl = max_ttl
+
+    def set_cache_file(self, path):
+        if self._store is not None:
+            if self._store.path == path:
+                return
+
+            self._store.close()
+            self._store = None
+
+        if path is None:
+            return
+
+        self._store = _PersistentStore(path)
+
+        # Load persisted entries, expired entries are skipped
+        now = _now()
+        for host, expire, answers in self._store.load():
+            self._insert(host, _CacheEntry(expire - now, answers))
+
+    def set_max_size(self, max_entries=None, max_bytes=None):
+        if max_entries is not None and not isinstance(max_entries, int):
+            raise ValueError(f'{max_entries.__class__.__name__} is not int type')
+        if max_bytes is not None and not isinstance(max_bytes, int):
+            raise ValueError(f'{max_bytes.__class__.__name__} is not int type')
+
+        with self._lock:
+            self._max_entries = max_entries
+            self._max_bytes = max_bytes
+            self._evict()
+
+    def set_ttl_bounds(self, min_ttl=None, max_ttl=None):
+        if min_ttl is not None:
+            _check_time(min_ttl)
+        if max_ttl is not None:
+            _check_time(max_ttl)
+
+        self._min_ttl = min_ttl or 0
+        self._max_ttl = max_ttl
+
+    def set_host_expire_time(self, host, time):
+        if time is None:
+            self._host_expire.pop(host, None)
+            return
+
+        _check_time(time)
+        self._host_expire[host] = time
+
+    def get_expire_time(self, host, ttl=None):
+        """Return how long ``host`` should be cached.
+
+        Per-host expire time is used if it's set, otherwise the record ``ttl``
+        (clamped by minimum and maximum TTL, and capped by the expire time if it's set) 
+        is used. If the record ``ttl`` is unknown, the expire time will be used.
+        """
         try:
-            item = self._data[host]
+            return self._host_expire[host]
         except KeyError:
+            pass
+
+        if ttl is None:
+            return _DEFAULT_EXPIRE_TIME if self._expire is None else self._expire
+
+        ttl = max(ttl, self._min_ttl)
+        if self._max_ttl is not None:
+            ttl = min(ttl, self._max_ttl)
+        if self._expire is not None:
+            ttl = min(ttl, self._expire)
+
+        return ttl
+
+    def _over_limit(self):
+        if self._max_entries is not None and len(self._data) > self._max_entries:
+            return True
+
+        return self._max_bytes is not None and self._size > self._max_bytes
+
+    def _remove(self, host):
+        entry = self._data.pop(host, None)
+        if entry is not None:
+            self._size -= _entry_size(host, entry)
+
+        return entry
+
+    def _evict(self):
+        # Lock must be held by the caller
+        now = _now()
+        while self._cnames and self._over_limit():
+            # Expired CNAME links are forgotten before any answers are evicted
+            alias, link = next(iter(self._cnames.items()))
+            if link[1] >= now:
+                break
+
+            self._remove_cname(alias)
+
+        while self._data and self._over_limit():
+            host, entry = self._data.popitem(last=False)
+            if entry.referenced and entry.expire + self._stale_time >= now:
+                # Second chance
+                entry.referenced = False
+                self._data[host] = entry
+                continue
+
+            self._size -= _entry_size(host, entry)
+            self._evictions += 1
+            # CNAME link of the host goes with its answers
+            self._remove_cname(host)
+            if metrics.enabled:
+                metrics.cache_event("cache_eviction", host)
+
+        while self._cnames and self._over_limit():
+            # Only CNAME links are left, forget the oldest ones
+            self._remove_cname(next(iter(self._cnames)))
+
+    def _insert(self, host, entry):
+        with self._lock:
+            self._remove(host)
+            self._data[host] = entry
+            self._size += _entry_size(host, entry)
+            self._evict()
+
+    def set_cache(self, host, answers, ttl=None):
+        entry = _CacheEntry(self.get_expire_time(host, ttl), answers)
+        self._insert(host, entry)
+
+        if self._store is not None:
+            self._store.set(host, entry.expire, entry.answers)
+
+        return entry
+
+    def set_negative_cache(self, host, error):
+        """Cache a failed DNS query of ``host``, 
+        the lifetime is taken from ``error.ttl`` (SOA minimum) if it's available"""
+        if self._negative_ttl is None:
+            # Negative caching is disabled
+            return
+
+        ttl = error.ttl if error.ttl is not None else self._negative_ttl
+        if self._max_negative_ttl is not None:
+            ttl = min(ttl, self._max_negative_ttl)
+
+        self._insert(host, _CacheEntry(ttl, (), error))
+
+    # ==============
+    # CNAME links
+    # ==============
+
+    def _remove_cname(self, alias):
+        # Lock must be held by the caller
+        link = self._cnames.pop(alias, None)
+        if link is None:
             return None
-        
-        now = datetime.now()
 
-        if item['expire'] < now:
-            # DNS cache is expired
-            self._data.pop(host)
+        self._size -= _link_size(alias, link)
+
+        aliases = self._aliases.get(link[0])
+        if aliases is not None:
+            aliases.discard(alias)
+            if not aliases:
+                del self._aliases[link[0]]
+
+        return link
+
+    def set_cname(self, alias, target, ttl=None):
+        """Cache a CNAME link from ``alias`` to ``target``, 
+        the lifetime is taken from ``ttl`` the same way as answers"""
+        alias = alias.rstrip(".").lower()
+        target = target.rstrip(".").lower()
+        expire = _now() + self.get_expire_time(alias, ttl)
+
+        link = (target, expire)
+        with self._lock:
+            self._remove_cname(alias)
+            self._cnames[alias] = link
+            self._size += _link_size(alias, link)
+            self._aliases.setdefault(target, set()).add(alias)
+
+            if self._max_entries is not None and len(self._cnames) > self._max_entries:
+                # Forget the oldest link
+                self._remove_cname(next(iter(self._cnames)))
+
+            self._evict()
+
+    def get_cname(self, host):
+        """Follow cached CNAME links from ``host`` and return a tuple of 
+        the last target that is reached and the earliest expire time of the links,
+        ``None`` if ``host`` is not a cached alias"""
+        if not self._cnames:
             return None
-        
-        return item['data']
 
-    def purge(self, host):
+        host = host.rstrip(".").lower()
+        now = _now()
+        visited = {host}
+        target = None
+        expire = None
+        for _ in range(_MAX_CNAME_CHAIN):
+            link = self._cnames.get(host)
+            if link is None:
+                # Chain ends here
+                break
+
+            if link[1] < now:
+                # The rest of the chain must be queried again
+                with self._lock:
+                    if self._cnames.get(host) is link:
+                        self._remove_cname(host)
+                break
+
+            if link[0] in visited:
+                # CNAME loop, links are cached from different answers
+                return None
+
+            visited.add(link[0])
+            target, link_expire = link
+            expire = link_expire if expire is None else min(expire, link_expire)
+            host = target
+
+        if target is None:
+            return None
+
+        return target, expire
+
+    def _purge_aliases(self, target, purged):
+        # Lock must be held by the caller
+        for alias in self._aliases.get(target, ()):
+            if alias in purged:
+                # CNAME loop
+                continue
+
+            purged.add(alias)
+            self._remove(alias)
+            self._purge_aliases(alias, purged)
+
+    def get_cache(self, host):
+        entry = self._data.get(host)
+        if entry is None:
+            return None
+
+        now = _now()
+        if entry.expire < now:
+            # DNS cache is expired, 
+            # keep it if it still can be served as stale answers in get_or_resolve()
+            if entry.expire + self._stale_time < now:
+                with self._lock:
+                    # Another thread may have already refreshed it
+                    if self._data.get(host) is entry:
+                        self._remove(host)
+            return None
+
+        if entry.error is not None:
+            return None
+
+        entry.referenced = True
+        return entry.answers
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=4,
+                        thread_name_prefix="requests_doh_refresh"
+                    )
+
+        return self._executor
+
+    def _store_answers(self, host, resolved):
+        answers, ttl = resolved
+        return self.set_cache(host, answers, ttl)
+
+    def _load_persisted(self, host):
+        if self._store is None:
+            return None
+
+        # Another process may have resolved it
+        persisted = self._store.get(host)
+        if persisted is None:
+            return None
+
+        expire, answers = persisted
+        current = self._data.get(host)
+        if current is not None and expire <= current.expire:
+            # Same (or older) answers as the cached ones,
+            # they're being refreshed so they must be queried again
+            return None
+
+        entry = _CacheEntry(expire - _now(), answers)
+        self._insert(host, entry)
+        return entry
+
+    def _run_query(self, host, resolve, inflight):
         try:
-            self._data.pop(host)
-        except KeyError:
+            entry = self._load_persisted(host)
+            if entry is None:
+                entry = self._store_answers(host, resolve(host))
+        except DNSQueryFailed as e:
+            self.set_negative_cache(host, e)
+            inflight.set_error(e)
+            raise
+        except BaseException as e:
+            inflight.set_error(e)
+            raise
+        else:
+            inflight.set_result(entry)
+        finally:
+            with self._lock:
+                self._inflight.pop(host, None)
+
+        return entry
+
+    def _refresh_in_background(self, host, resolve):
+        with self._lock:
+            if host in self._inflight:
+                # Already being resolved
+                return
+
+            inflight = self._inflight[host] = _InflightQuery()
+
+        def refresh():
+            try:
+                self._run_query(host, resolve, inflight)
+            except Exception as e:
+                log.debug(f"Failed to refresh DNS cache of host '{host}': {e}")
+
+        self._get_executor().submit(refresh)
+
+    def stats(self):
+        """Return a dict containing number of cached entries, 
+        approximate memory usage of the cache (entries and CNAME links) in bytes, 
+        number of evicted entries and number of cached CNAME links"""
+        return {
+            "entries": len(self._data),
+            "bytes": self._size,
+            "evictions": self._evictions,
+            "cnames": len(self._cnames),
+        }
+
+    def _lookup(self, host, refresh):
+        """Return cache entry of ``host`` or ``None`` if it's not cached.
+
+        Cached failures are raised, and ``refresh()`` is called 
+        when the answers should be refreshed in background.
+        """
+        entry = self._data.get(host)
+        if entry is None:
+            if metrics.enabled:
+                metrics.cache_event("cache_miss", host)
+            return None
+
+        now = _now()
+        if entry.error is not None:
+            if entry.expire >= now:
+                entry.referenced = True
+                if metrics.enabled:
+                    metrics.cache_event("cache_negative_hit", host)
+                # Raise a copy, so tracebacks don't pile up on the cached exception
+                raise copy.copy(entry.error).with_traceback(None)
+        elif entry.expire >= now:
+            entry.referenced = True
+            entry.hits += 1
+            if metrics.enabled:
+                metrics.cache_event("cache_hit", host)
+
+            if (
+                self._prefetch_hits is not None
+                and entry.hits >= self._prefetch_hits
+                and entry.expire - now <= entry.lifetime * self._prefetch_ratio
+            ):
+                # Frequently used entry is about to expire
+                refresh()
+
+            return entry
+        elif entry.expire + self._stale_time >= now:
+            # Serve stale answers while they're refreshed
+            entry.referenced = True
+            if metrics.enabled:
+                metrics.cache_event("cache_stale_hit", host)
+            refresh()
+            return entry
+
+        if metrics.enabled:
+            metrics.cache_event("cache_expiration", host)
+        return None
+
+    def get_or_resolve(self, host, resolve):
+        """Return cached answers of ``host``, 
+        if it's not cached ``resolve(host)`` is called and the result is cached.
+
+        ``resolve`` must return a tuple of answers and TTL.
+        Only one thread resolves the same host at a time (single-flight),
+        other threads wait for its result or error.
+        """
+        return self.get_or_resolve_entry(host, resolve).answers
+
+    def get_or_resolve_entry(self, host, resolve):
+        """Same as :meth:`get_or_resolve`, but return the cache entry 
+        that also has parsed ``sockaddrs`` of the answers"""
+        entry = self._lookup(host, lambda: self._refresh_in_background(host, resolve))
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            # Answers may be cached while we're waiting for the lock
+            entry = self._data.get(host)
+            if entry is not None and entry.expire >= _now():
+                if entry.error is not None:
+                    raise copy.copy(entry.error).with_traceback(None)
+                return entry
+
+            inflight = self._inflight.get(host)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[host] = _InflightQuery()
+
+        if not leader:
+            return inflight.wait()
+
+        return self._run_query(host, resolve, inflight)
+
+    async def _run_blocking(self, func, *args):
+        if self._store is None:
+            return func(*args)
+
+        # Cache file is read and written in a thread, so the event loop is not blocked
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _query_async(self, key, host, resolve):
+        try:
+            entry = await self._run_blocking(self._load_persisted, host)
+            if entry is None:
+                resolved = await resolve(host)
+                entry = await self._run_blocking(self._store_answers, host, resolved)
+        except DNSQueryFailed as e:
+            self.set_negative_cache(host, e)
+            raise
+        finally:
+            self._inflight_async.pop(key, None)
+
+        return entry
+
+    async def _run_query_async(self, host, resolve):
+        loop = asyncio.get_running_loop()
+        key = (loop, host)
+
+        task = self._inflight_async.get(key)
+        if task is None:
+            # The query runs in its own task, so cancelling one of the tasks
+            # that are waiting for it doesn't cancel the others
+            task = self._inflight_async[key] = loop.create_task(
+                self._query_async(key, host, resolve)
+            )
+            task.add_done_callback(_retrieve_exception)
+
+        return await asyncio.shield(task)
+
+    def _refresh_in_background_async(self, host, resolve):
+        def done(task):
+            if not task.cancelled() and task.exception() is not None:
+                log.debug(f"Failed to refresh DNS cache of host '{host}': {task.exception()}")
+
+        task = asyncio.ensure_future(self._run_query_async(host, resolve))
+        task.add_done_callback(done)
+
+    async def get_or_resolve_async(self, host, resolve):
+        """Same as :meth:`get_or_resolve`, but ``resolve`` is a coroutine function.
+
+        Only one task in the same event loop resolves the same host at a time.
+        """
+        return (await self.get_or_resolve_entry_async(host, resolve)).answers
+
+    async def get_or_resolve_entry_async(self, host, resolve):
+        """Same as :meth:`get_or_resolve_async`, but return the cache entry"""
+        entry = self._lookup(host, lambda: self._refresh_in_background_async(host, resolve))
+        if entry is None:
+            entry = await self._run_query_async(host, resolve)
+
+        return entry
+
+    def close(self):
+        """Stop background refresh threads and close the cache file,
+        cached answers are kept in memory"""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self.set_cache_file(None)
+
+    def purge(self, host):
+        key = host.rstrip(".").lower()
+        purged = set()
+        with self._lock:
+            removed = self._remove(host)
+            link = self._remove_cname(key)
+
+            # Answers of aliases came from this host
+            self._purge_aliases(key, purged)
+
+        stored = False
+        if self._store is not None:
+            stored = self._store.delete(host)
+            for alias in purged:
+                self._store.delete(alias)
+
+        if removed is None and link is None and not stored:
             raise ValueError(f"host '{host}' is not cached")
 
     def purge_all(self):
-        self._data.clear()
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+            self._cnames = OrderedDict()
+            self._aliases = {}
+
+        if self._store is not None:
+            self._store.clear()
 
 cachemanager = DNSCacheManager()
 
 def set_dns_cache_expire_time(time):
     """Set DNS cache expired time in seconds
+
+    By default, DNS caches are expired based on TTL returned from DoH provider.
+    If the expire time is set, DNS caches are expired after the TTL 
+    or the expire time, whichever is shorter. 
+    It's also used for DNS answers that have no TTL (default to 300 seconds).
     
     Parameters
     -----------
     time: :class:`float`
-        An expire time
+        An expire time, if ``None`` only TTLs are used (the default)
     """
     cachemanager.set_expire_time(time)
 
+def set_dns_cache_ttl_bounds(min_ttl=None, max_ttl=None):
+    """Set minimum and maximum TTL (in seconds) of DNS caches
+
+    TTL returned from DoH provider will be clamped to these values.
+
+    Parameters
+    -----------
+    min_ttl: :class:`float`
+        Minimum TTL, if ``None`` there is no minimum TTL
+    max_ttl: :class:`float`
+        Maximum TTL, if ``None`` there is no maximum TTL
+    """
+    cachemanager.set_ttl_bounds(min_ttl, max_ttl)
+
+def set_dns_cache_host_expire_time(host, time):
+    """Set DNS cache expire time in seconds for specific host, 
+    this will override TTL returned from DoH provider
+
+    Parameters
+    -----------
+    host: :class:`str`
+        A host
+    time: :class:`float`
+        An expire time, if ``None`` the override will be removed
+    """
+    cachemanager.set_host_expire_time(host, time)
+
+def set_dns_cache_stale_time(time):
+    """Set how long (in seconds) expired DNS caches can still be used
+
+    When an expired DNS cache is used, it will be refreshed in background
+    so requests don't have to wait for DNS resolution (stale-while-revalidate).
+    Set it to ``0`` to disable it (the default).
+
+    Parameters
+    -----------
+    time: :class:`float`
+        Maximum staleness of DNS caches
+    """
+    cachemanager.set_stale_time(time)
+
+def set_dns_cache_prefetch(min_hits, ratio=0.1):
+    """Refresh frequently used DNS caches in background shortly before they're expired
+
+    Parameters
+    -----------
+    min_hits: :class:`int`
+        Number of cache hits needed for a DNS cache to be prefetched, 
+        if ``None`` prefetch is disabled (the default)
+    ratio: :class:`float`
+        A DNS cache is prefetched when its remaining lifetime 
+        is less than ``ratio`` of its total lifetime
+    """
+    cachemanager.set_prefetch(min_hits, ratio)
+
+def set_dns_cache_negative_ttl(time, max_ttl=None):
+    """Enable caching of failed DNS queries (NXDOMAIN, SERVFAIL and empty answers)
+
+    Failed DNS queries are cached for SOA minimum TTL returned from DoH provider (RFC 2308),
+    or for ``time`` seconds if there is no SOA record in the response. 
+    While it's cached, :class:`DNSQueryFailed` is raised without querying DoH provider.
+
+    Parameters
+    -----------
+    time: :class:`float`
+        Default negative cache TTL, if ``None`` negative caching is disabled (the default)
+    max_ttl: :class:`float`
+        Maximum negative cache TTL, if ``None`` there is no maximum TTL
+    """
+    cachemanager.set_negative_ttl(time, max_ttl)
+
+def set_dns_cache_file(path):
+    """Store DNS cache in a sqlite database file
+
+    Cached DNS answers are loaded from the file (expired ones are skipped) 
+    and newly resolved answers are written to it, 
+    so DNS caches survive process restarts and can be shared between processes.
+    :func:`purge_dns_cache` will also remove entries from the file.
+
+    Parameters
+    -----------
+    path: :class:`str`
+        Path to DNS cache file, if ``None`` the DNS cache will be stored in memory only (the default)
+    """
+    cachemanager.set_cache_file(path)
+
+def set_dns_cache_max_size(max_entries=None, max_bytes=None):
+    """Set maximum size of DNS cache, 
+    least recently used entries will be evicted when the cache is full
+
+    Parameters
+    -----------
+    max_entries: :class:`int`
+        Maximum number of cached hosts, if ``None`` there is no limit
+    max_bytes: :class:`int`
+        Maximum approximate memory usage of DNS cache in bytes, if ``None`` there is no limit
+    """
+    cachemanager.set_max_size(max_entries, max_bytes)
+
 def purge_dns_cache(host=None):
     """Purge DNS cache
 
@@ -62,6 +891,8 @@ def purge_dns_cache(host=None):
     -----------
     host: :class:`str`
         Cached DNS host want to be purged, if ``host`` is None, all DNS caches will be purged.
+        Cached CNAME link of ``host`` is purged too, as well as cached answers 
+        of the aliases that point to ``host``.
     """
     if host:
         cachemanager.purge(host)
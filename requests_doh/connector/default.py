@@ -1,8 +1,10 @@
 from __future__ import absolute_import
-import ipaddress
 
+import os
+import errno
 import socket
-import logging
+import selectors
+from time import monotonic
 from urllib3.connection import HTTPSConnection, HTTPConnection
 from urllib3.util.connection import allowed_gai_family, _set_socket_options
 from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, LocationParseError
@@ -19,10 +21,164 @@ except ImportError:
         finally:
             value = None
 
-from ..resolver import resolve_dns
-from ..cachemanager import cachemanager
+from ..resolver import get_default_resolver
 
-log = logging.getLogger(__name__)
+# Results of non-blocking connect_ex() while the connection is being established,
+# Windows returns WSAEWOULDBLOCK instead of EINPROGRESS
+_CONNECT_IN_PROGRESS = frozenset(
+    i for i in (
+        errno.EINPROGRESS,
+        errno.EWOULDBLOCK,
+        errno.EAGAIN,
+        getattr(errno, "WSAEWOULDBLOCK", None)
+    )
+    if i is not None
+)
+
+def _interleave_families(addrinfos):
+    """Reorder ``addrinfos`` so address families are alternating,
+    starting with the family of the first address (RFC 8305 section 4)"""
+    groups = {}
+    for addrinfo in addrinfos:
+        groups.setdefault(addrinfo[0], []).append(addrinfo)
+
+    queues = list(groups.values())
+    interleaved = []
+    while queues:
+        for queue in queues:
+            interleaved.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+
+    return interleaved
+
+def _restore_timeout(sock, timeout):
+    if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+        sock.settimeout(socket.getdefaulttimeout())
+    else:
+        sock.settimeout(timeout)
+
+def _staggered_connect(
+    addrinfos, timeout, source_address, socket_options, delay, on_failure=None, on_success=None
+):
+    """Happy Eyeballs (RFC 8305) connection racing.
+
+    Start a non-blocking connection attempt to each address, ``delay`` seconds apart
+    (or immediately when the previous attempt has failed), and return the first socket
+    that connects. All the other attempts are closed.
+
+    If ``on_failure`` is set, it's called with the sockaddr of every failed attempt.
+    If ``on_success`` is set, it's called with the sockaddr and connect RTT of the winner.
+    """
+    if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+        timeout = socket.getdefaulttimeout()
+    deadline = None if timeout is None else monotonic() + timeout
+
+    addrinfos = iter(_interleave_families(addrinfos))
+    selector = selectors.DefaultSelector()
+    pending = []
+    exhausted = False
+    next_attempt = monotonic()
+    winner = None
+    winner_sa = None
+    rtt = None
+    err = None
+
+    try:
+        while winner is None:
+            now = monotonic()
+
+            if not exhausted and (now >= next_attempt or not pending):
+                addrinfo = next(addrinfos, None)
+                if addrinfo is None:
+                    exhausted = True
+                else:
+                    af, socktype, proto, canonname, sa = addrinfo
+                    sock = None
+                    try:
+                        sock = socket.socket(af, socktype, proto)
+
+                        # If provided, set socket level options before connecting.
+                        _set_socket_options(sock, socket_options)
+
+                        if source_address:
+                            sock.bind(source_address)
+                        sock.setblocking(False)
+                        rc = sock.connect_ex(sa)
+                    except socket.error as e:
+                        err = e
+                        if sock is not None:
+                            sock.close()
+                        if on_failure is not None:
+                            on_failure(sa)
+                        continue
+
+                    if rc == 0:
+                        winner = sock
+                        winner_sa = sa
+                        rtt = monotonic() - now
+                        break
+                    elif rc not in _CONNECT_IN_PROGRESS:
+                        err = socket.error(rc, os.strerror(rc))
+                        sock.close()
+                        if on_failure is not None:
+                            on_failure(sa)
+                        continue
+
+                    # Attempt start time is stored to measure connect RTT
+                    selector.register(sock, selectors.EVENT_WRITE, (sa, now))
+                    pending.append(sock)
+                    next_attempt = now + delay
+
+            if exhausted and not pending:
+                break
+
+            if deadline is not None and now >= deadline:
+                err = SocketTimeout("timed out")
+                break
+
+            wait = None
+            if not exhausted:
+                wait = max(next_attempt - now, 0)
+            if deadline is not None:
+                remaining = max(deadline - now, 0)
+                wait = remaining if wait is None else min(wait, remaining)
+
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                pending.remove(sock)
+
+                sa, started = key.data
+                rc = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if rc == 0:
+                    winner = sock
+                    winner_sa = sa
+                    rtt = monotonic() - started
+                    break
+
+                err = socket.error(rc, os.strerror(rc))
+                sock.close()
+                if on_failure is not None:
+                    on_failure(sa)
+
+                # Previous attempt is failed, start the next one immediately
+                next_attempt = monotonic()
+    finally:
+        for sock in pending:
+            if sock is not winner:
+                sock.close()
+        selector.close()
+
+    if winner is not None:
+        _restore_timeout(winner, timeout)
+        if on_success is not None:
+            on_success(winner_sa, rtt)
+        return winner
+
+    if err is not None:
+        raise err
+
+    raise socket.error("getaddrinfo returns an empty list")
 
 # This code is copied from urllib3/util/connection.py version 1.26.8 (from requests v2.28.1)
 def create_connection(
@@ -30,10 +186,18 @@ def create_connection(
     timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
     source_address=None,
     socket_options=None,
-    proxy=None
+    proxy=None,
+    happy_eyeballs_delay=None,
+    resolver=None
 ):
     """Same as :meth:`urllib3.util.connection.create_connection()`, 
     except it has DNS over HTTPS resovler inside of it.
+
+    If ``resolver`` is not set, the default resolver will be used.
+
+    If ``happy_eyeballs_delay`` is set, connection attempts to all resolved addresses 
+    are raced with Happy Eyeballs (RFC 8305) algorithm, 
+    each attempt is started ``happy_eyeballs_delay`` seconds after the previous one.
     """
 
     host, port = address
@@ -53,39 +217,48 @@ def create_connection(
             LocationParseError(u"'%s', label empty or too long" % host), None
         )
 
+    health = None
     if not proxy:
-        cached = cachemanager.get_cache(host)
-        if not cached:
-            # Uncached DNS
-            answers = resolve_dns(host)
-
-            cachemanager.set_cache(host, answers)
-        else:
-            answers = cached
-    
-    if proxy:
-        # We must make sure that this isn't a DNS name
-        try:
-            socket.inet_aton(host)
-        except OSError:
-            # This is a DNS name
-            # To be honest, this is messed up
-            answers = [i[4][0] for i in socket.getaddrinfo(host, port)]
-        else:
-            # It's an ip address
-            answers = [host]
-
-    for answer in answers:
-        try:
-            ipaddress.ip_address(answer)
-        except ValueError:
-            # Most likely this is domain returned from DoH provider
-            log.warning(f"Domain detected ({answer}) in DoH query result to {host}")
+        if resolver is None:
+            resolver = get_default_resolver()
+
+        # Addresses are parsed when they're resolved, no need to parse them here.
+        # They're rotated (or sorted by connect RTT) and quarantined addresses are moved to the end
+        health = resolver.address_health
+        sockaddrs = health.order(host, resolver._get_sockaddrs(host))
+    else:
+        # Resolve proxy address with the system resolver
+        sockaddrs = [(i[0], i[4]) for i in socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)]
+
+    addrinfos = []
+    for af, sa in sockaddrs:
+        if family == socket.AF_INET and af != socket.AF_INET:
+            # IPv6 is not available
+            err = socket.gaierror(socket.EAI_FAMILY, "Address family for hostname not supported")
             continue
-        
-        for res in socket.getaddrinfo(answer, port, family, socket.SOCK_STREAM):
+
+        addrinfos.append((af, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (sa[0], port) + sa[2:]))
+
+    on_failure = None
+    on_success = None
+    if health is not None:
+        preferred = health.get_preferred_family(host)
+        if preferred is not None and addrinfos and addrinfos[0][0] != preferred:
+            # Try the address family that was connected last time first
+            addrinfos.sort(key=lambda addrinfo: addrinfo[0] != preferred)
+
+        on_failure = lambda sa: health.record_failure(sa[0])
+        on_success = lambda sa, rtt: health.record_success(sa[0], rtt)
+
+    sock = None
+    if happy_eyeballs_delay is not None and addrinfos:
+        sock = _staggered_connect(
+            addrinfos, timeout, source_address, socket_options, happy_eyeballs_delay,
+            on_failure, on_success
+        )
+    else:
+        for res in addrinfos:
             af, socktype, proto, canonname, sa = res
-            sock = None
             try:
                 sock = socket.socket(af, socktype, proto)
 
@@ -96,19 +269,37 @@ def create_connection(
                     sock.settimeout(timeout)
                 if source_address:
                     sock.bind(source_address)
+
+                started = monotonic()
                 sock.connect(sa)
-                return sock
+                if on_success is not None:
+                    on_success(sa, monotonic() - started)
+                break
 
             except socket.error as e:
                 err = e
                 if sock is not None:
                     sock.close()
                     sock = None
+                if on_failure is not None:
+                    on_failure(sa)
+
+    if sock is not None:
+        if health is not None:
+            health.set_preferred_family(host, sock.family)
+        return sock
 
     if err is not None:
         raise err
 
+    raise socket.error("getaddrinfo returns an empty list")
+
 class DoHHTTPConnection(HTTPConnection):
+    def __init__(self, *args, happy_eyeballs_delay=None, resolver=None, **kwargs):
+        self.happy_eyeballs_delay = happy_eyeballs_delay
+        self.resolver = resolver
+        super().__init__(*args, **kwargs)
+
     # This code is copied from urllib3/connection.py version 1.26.8 (from requests v2.28.1)
     def _new_conn(self):
         """Establish a socket connection and set nodelay settings on it.
@@ -123,6 +314,8 @@ class DoHHTTPConnection(HTTPConnection):
             extra_kw["socket_options"] = self.socket_options
 
         extra_kw["proxy"] = self.proxy
+        extra_kw["happy_eyeballs_delay"] = self.happy_eyeballs_delay
+        extra_kw["resolver"] = self.resolver
 
         try:
             conn = create_connection(
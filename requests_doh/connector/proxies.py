@@ -13,11 +13,66 @@ from urllib3.contrib.socks import socks, _TYPE_SOCKS_OPTIONS, SocketTimeout
 from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
 from urllib3.connection import HTTPConnection, HTTPSConnection
 
-from ..resolver import resolve_dns
-from ..cachemanager import cachemanager
+from ..resolver import get_default_resolver, _is_ip_address
+
+# Errors of proxy servers that mean the destination address is unreachable,
+# other addresses of the destination host may still be reachable
+_SOCKS5_DESTINATION_ERRORS = (0x03, 0x04, 0x05, 0x06)
+_SOCKS4_DESTINATION_ERRORS = (0x5B,)
+_HTTP_DESTINATION_ERRORS = (502, 503, 504)
+
+def _is_destination_error(error):
+    """Return ``True`` if ``error`` is caused by the destination address, not the proxy server"""
+    if isinstance(error, socks.GeneralProxyError) and isinstance(error.socket_err, socks.ProxyError):
+        # Negotiation errors are wrapped by socksocket.connect()
+        error = error.socket_err
+
+    if isinstance(error, socks.SOCKS5Error):
+        codes = _SOCKS5_DESTINATION_ERRORS
+    elif isinstance(error, socks.SOCKS4Error):
+        codes = _SOCKS4_DESTINATION_ERRORS
+    elif isinstance(error, socks.HTTPError):
+        codes = _HTTP_DESTINATION_ERRORS
+    else:
+        return False
+
+    # Error messages are formatted as "0x04: Host unreachable" or "502: Bad Gateway"
+    try:
+        code = int(error.msg.split(":", 1)[0], 0)
+    except ValueError:
+        return False
+
+    return code in codes
+
+def _format_host(host):
+    """Wrap IPv6 address in brackets, so it can be followed by a port"""
+    if ":" in host and not host.startswith("["):
+        return f"[{host}]"
+
+    return host
 
 class socksocketmod(socks.socksocket):
     """Modified socks socket to resolve DNS remotely to public or private DNS servers"""
+    # DoH resolver, if it's ``None`` the default resolver will be used
+    resolver = None
+
+    # Resolved address of the destination host that is sent to the proxy server,
+    # if it's ``None`` the first resolved address will be used
+    destination_address = None
+
+    def _get_answers(self, host):
+        resolver = self.resolver
+        if resolver is None:
+            resolver = get_default_resolver()
+
+        return resolver._get_answers(host)
+
+    def _get_destination_address(self, host):
+        if self.destination_address is not None:
+            return self.destination_address
+
+        return self._get_answers(host)[0]
+
     def _write_SOCKS5_address(self, addr, file):
         """
         Return the host and port packed for the SOCKS5 protocol,
@@ -48,15 +103,9 @@ class socksocketmod(socks.socksocket):
         else:
             # { MODIFIED CODE }
             # Resolve remotely
-            cached = cachemanager.get_cache(host)
-            if not cached:
-                addresses = resolve_dns(host)
+            address = self._get_destination_address(host)
 
-                cachemanager.set_cache(host, addresses)
-            else:
-                addresses = cached
-
-            addresses = socket.getaddrinfo(addresses[0], port, socket.AF_UNSPEC,
+            addresses = socket.getaddrinfo(address, port, socket.AF_UNSPEC,
                                            socket.SOCK_STREAM,
                                            socket.IPPROTO_TCP,
                                            socket.AI_ADDRCONFIG)
@@ -98,15 +147,7 @@ class socksocketmod(socks.socksocket):
                     remote_resolve = True
                 else:
                     # { MODIFIED CODE }
-                    cached = cachemanager.get_cache(dest_addr)
-                    if not cached:
-                        addresses = resolve_dns(dest_addr)
-
-                        cachemanager.set_cache(dest_addr, addresses)
-                    else:
-                        addresses = cached
-
-                    address = addresses[0]
+                    address = self._get_destination_address(dest_addr)
                     addr_bytes = socket.inet_aton(address)
 
             # Construct the request packet
@@ -157,20 +198,12 @@ class socksocketmod(socks.socksocket):
 
         # { MODIFIED CODE }
         # If we need to resolve locally, we do this now (with caching)
-        cached = cachemanager.get_cache(dest_addr)
-        if not cached and not rdns:
-            addresses = resolve_dns(dest_addr)
-
-            cachemanager.set_cache(dest_addr, addresses)
-        else:
-            addresses = cached
-
-        addr = dest_addr if rdns else addresses[0]
+        addr = dest_addr if rdns else self._get_destination_address(dest_addr)
 
         http_headers = [
-            (b"CONNECT " + addr.encode("idna") + b":"
+            (b"CONNECT " + _format_host(addr).encode("idna") + b":"
              + str(dest_port).encode() + b" HTTP/1.1"),
-            b"Host: " + dest_addr.encode("idna")
+            b"Host: " + _format_host(dest_addr).encode("idna")
         ]
 
         if username and password:
@@ -230,7 +263,7 @@ def create_connection(dest_pair,
                       proxy_type=None, proxy_addr=None,
                       proxy_port=None, proxy_rdns=True,
                       proxy_username=None, proxy_password=None,
-                      socket_options=None):
+                      socket_options=None, resolver=None):
     """create_connection(dest_pair, *[, timeout], **proxy_args) -> socket object
 
     Like socket.create_connection(), but connects to proxy
@@ -241,6 +274,11 @@ def create_connection(dest_pair,
     timeout - Optional socket timeout value, in seconds.
     source_address - tuple (host, port) for the socket to bind to as its source
     address before connecting (only for compatibility)
+    resolver - DoH resolver, if it's None the default resolver will be used
+
+    If the destination host is resolved locally and the proxy server 
+    can't reach one of its addresses, the next address is tried 
+    and the unreachable one is quarantined.
     """
     # Remove IPv6 brackets on the remote address and proxy address.
     remote_host, remote_port = dest_pair
@@ -251,34 +289,65 @@ def create_connection(dest_pair,
 
     err = None
 
+    # { MODIFIED CODE }
+    # Resolved addresses of the destination host, in the order they should be tried.
+    # ``None`` means the destination host is sent to the proxy server as it is
+    health = None
+    destination_addresses = [None]
+    if proxy_type and not proxy_rdns and not _is_ip_address(remote_host):
+        if resolver is None:
+            resolver = get_default_resolver()
+
+        health = resolver.address_health
+        sockaddrs = health.order(remote_host, resolver._get_sockaddrs(remote_host))
+        if proxy_type == socks.SOCKS4:
+            # SOCKS4 only supports IPv4 addresses
+            sockaddrs = [i for i in sockaddrs if i[0] == socket.AF_INET]
+
+        destination_addresses = [sa[0] for _, sa in sockaddrs] or [None]
+
     # Allow the SOCKS proxy to be on IPv4 or IPv6 addresses.
     for r in socket.getaddrinfo(proxy_addr, proxy_port, 0, socket.SOCK_STREAM):
         family, socket_type, proto, canonname, sa = r
-        sock = None
-        try:
-            sock = socksocketmod(family, socket_type, proto)
+        for destination_address in destination_addresses:
+            sock = None
+            try:
+                sock = socksocketmod(family, socket_type, proto)
+                sock.resolver = resolver
+                sock.destination_address = destination_address
+
+                if socket_options:
+                    for opt in socket_options:
+                        sock.setsockopt(*opt)
+
+                if isinstance(timeout, (int, float)):
+                    sock.settimeout(timeout)
+
+                if proxy_type:
+                    sock.set_proxy(proxy_type, proxy_addr, proxy_port, proxy_rdns,
+                                   proxy_username, proxy_password)
+                if source_address:
+                    sock.bind(source_address)
 
-            if socket_options:
-                for opt in socket_options:
-                    sock.setsockopt(*opt)
+                sock.connect((remote_host, remote_port))
 
-            if isinstance(timeout, (int, float)):
-                sock.settimeout(timeout)
+                if health is not None and destination_address is not None:
+                    health.record_success(destination_address)
+                return sock
 
-            if proxy_type:
-                sock.set_proxy(proxy_type, proxy_addr, proxy_port, proxy_rdns,
-                               proxy_username, proxy_password)
-            if source_address:
-                sock.bind(source_address)
+            except (socket.error, socks.ProxyError) as e:
+                err = e
+                if sock:
+                    sock.close()
+                    sock = None
 
-            sock.connect((remote_host, remote_port))
-            return sock
+                if not _is_destination_error(e):
+                    # The proxy server is failing, try the next one
+                    break
 
-        except (socket.error, socks.ProxyError) as e:
-            err = e
-            if sock:
-                sock.close()
-                sock = None
+                if health is not None and destination_address is not None:
+                    # The proxy server is fine, try the next address of the destination host
+                    health.record_failure(destination_address)
 
     if err:
         raise err
@@ -295,9 +364,11 @@ class SOCKSConnection(HTTPConnection):
         self,
         _socks_options: _TYPE_SOCKS_OPTIONS,
         *args: typing.Any,
+        resolver: typing.Any = None,
         **kwargs: typing.Any,
     ) -> None:
         self._socks_options = _socks_options
+        self.resolver = resolver
         super().__init__(*args, **kwargs)
 
     def _new_conn(self) -> socksocketmod:
@@ -321,6 +392,7 @@ class SOCKSConnection(HTTPConnection):
                 proxy_password=self._socks_options["password"],
                 proxy_rdns=self._socks_options["rdns"],
                 timeout=self.timeout,
+                resolver=self.resolver,
                 **extra_kw,
             )
 
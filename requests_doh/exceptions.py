@@ -2,8 +2,21 @@ class RequestsDOHException(Exception):
     """Base exception for requests_doh library"""
 
 class DNSQueryFailed(RequestsDOHException):
-    """Failed to query DNS from given host"""
-    pass
+    """Failed to query DNS from given host
+    
+    Attributes
+    -----------
+    rcode: Optional[:class:`dns.rcode.Rcode`]
+        Response code returned from DoH provider, 
+        ``None`` if the DoH provider returned empty results
+    ttl: Optional[:class:`int`]
+        How long this failure can be cached (in seconds) based on SOA record 
+        returned from DoH provider, ``None`` if there is no SOA record
+    """
+    def __init__(self, *args, rcode=None, ttl=None):
+        super().__init__(*args)
+        self.rcode = rcode
+        self.ttl = ttl
 
 class NoDoHProvider(RequestsDOHException):
     """There is no active DoH provider"""
@@ -0,0 +1,266 @@
+import random
+import threading
+from time import monotonic
+
+__all__ = ('AddressHealth',)
+
+class AddressHealth:
+    """Connection health of resolved addresses, shared by all connections of a resolver
+
+    Addresses of a host are rotated on every connection to spread the load
+    (within each address family, so the order of families is kept).
+    Addresses that failed to connect are quarantined, they're tried after
+    the healthy ones until their backoff period is over. The backoff period
+    is doubled on each consecutive failure, up to ``max_backoff`` seconds.
+
+    If RTT scoring is enabled, connect RTT of every address is recorded as
+    an exponentially weighted moving average. Addresses within ``rtt_tolerance``
+    (relative) or ``rtt_margin`` seconds of the fastest one and addresses without
+    RTT samples are rotated, clearly slower ones are tried after them.
+    With ``exploration`` probability the addresses are only rotated instead,
+    so RTT of the slower addresses is still measured.
+
+    Parameters
+    -----------
+    backoff: :class:`float`
+        Quarantine period in seconds after the first failure, ``0`` to disable quarantine
+    max_backoff: :class:`float`
+        Maximum quarantine period in seconds
+    rotate: :class:`bool`
+        Rotate addresses of a host on every connection
+    rtt_scoring: :class:`bool`
+        Try addresses with the lowest connect RTT first
+    rtt_alpha: :class:`float`
+        Weight of a new RTT sample in the moving average, between 0 and 1
+    rtt_tolerance: :class:`float`
+        How much slower (relative to the fastest address) an address can be
+        and still be rotated with the fastest ones
+    rtt_margin: :class:`float`
+        Same as ``rtt_tolerance``, but absolute in seconds
+    exploration: :class:`float`
+        Probability of ignoring RTT scores on a connection, between 0 and 1
+    max_hosts: :class:`int`
+        Maximum number of hosts (and addresses) that their rotation, 
+        preferred address family and RTT are remembered
+    """
+    def __init__(
+        self,
+        backoff=1.0,
+        max_backoff=60.0,
+        rotate=True,
+        rtt_scoring=True,
+        rtt_alpha=0.3,
+        rtt_tolerance=0.5,
+        rtt_margin=0.005,
+        exploration=0.05,
+        max_hosts=4096
+    ):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rotate = rotate
+        self.rtt_scoring = rtt_scoring
+        self.rtt_alpha = rtt_alpha
+        self.rtt_tolerance = rtt_tolerance
+        self.rtt_margin = rtt_margin
+        self.exploration = exploration
+        self.max_hosts = max_hosts
+
+        # Address -> (quarantined until, consecutive failures)
+        self._quarantine = {}
+        # Address -> (RTT moving average in seconds, number of samples)
+        self._rtts = {}
+        self._rotation = {}
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, table, host, value):
+        table.pop(host, None)
+        table[host] = value
+        if len(table) > self.max_hosts:
+            # Forget the oldest one
+            try:
+                table.pop(next(iter(table)))
+            except (StopIteration, RuntimeError, KeyError):
+                # Modified by another thread
+                pass
+
+    # ==================
+    # Address families
+    # ==================
+
+    def get_preferred_family(self, host):
+        """Return address family that was connected successfully to ``host`` last time"""
+        return self._families.get(host)
+
+    def set_preferred_family(self, host, family):
+        if self._families.get(host) != family:
+            self._remember(self._families, host, family)
+
+    # ============
+    # Quarantine
+    # ============
+
+    def is_quarantined(self, address, now=None):
+        state = self._quarantine.get(address)
+        if state is None:
+            return False
+
+        return state[0] > (monotonic() if now is None else now)
+
+    def record_failure(self, address):
+        """Quarantine ``address`` after it failed to connect"""
+        if not self.backoff:
+            return
+
+        with self._lock:
+            _, failures = self._quarantine.get(address, (0, 0))
+            failures += 1
+            period = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+            now = monotonic()
+            self._quarantine[address] = (now + period, failures)
+
+            if len(self._quarantine) > self.max_hosts:
+                # Forget addresses that have been released long ago
+                self._quarantine = {
+                    address: state for address, state in self._quarantine.items()
+                    if state[0] + self.max_backoff > now
+                }
+
+    def record_success(self, address, rtt=None):
+        """Release ``address`` from quarantine after it connected successfully
+        and record its connect RTT in seconds (if it's measured)"""
+        if address in self._quarantine:
+            with self._lock:
+                self._quarantine.pop(address, None)
+
+        if rtt is not None:
+            with self._lock:
+                state = self._rtts.get(address)
+                if state is None:
+                    state = (rtt, 1)
+                else:
+                    average, samples = state
+                    state = (average + self.rtt_alpha * (rtt - average), samples + 1)
+
+                self._remember(self._rtts, address, state)
+
+    def get_quarantined(self):
+        """Return a dict of quarantined addresses, their remaining
+        quarantine period in seconds and number of consecutive failures"""
+        now = monotonic()
+        with self._lock:
+            return {
+                address: {"remaining": until - now, "failures": failures}
+                for address, (until, failures) in self._quarantine.items()
+                if until > now
+            }
+
+    def get_stats(self):
+        """Return a dict of addresses with their connect RTT moving average in seconds (``rtt``),
+        number of RTT samples (``samples``), consecutive failures (``failures``)
+        and remaining quarantine period in seconds (``quarantined``, ``0`` if it's not quarantined)"""
+        now = monotonic()
+        with self._lock:
+            rtts = list(self._rtts.items())
+            quarantine = list(self._quarantine.items())
+
+        stats = {}
+        for address, (average, samples) in rtts:
+            stats[address] = {"rtt": average, "samples": samples, "failures": 0, "quarantined": 0}
+
+        for address, (until, failures) in quarantine:
+            info = stats.setdefault(
+                address, {"rtt": None, "samples": 0, "failures": 0, "quarantined": 0}
+            )
+            info["failures"] = failures
+            info["quarantined"] = max(until - now, 0)
+
+        return stats
+
+    def clear_stats(self):
+        """Forget RTT and quarantine of all addresses"""
+        with self._lock:
+            self._rtts = {}
+            self._quarantine = {}
+
+    # ==========
+    # Ordering
+    # ==========
+
+    def _next_offset(self, host):
+        if not self.rotate:
+            return 0
+
+        offset = self._rotation.get(host, 0)
+        self._remember(self._rotation, host, offset + 1)
+        return offset
+
+    def _split_by_rtt(self, group):
+        """Split ``group`` into addresses as fast as the fastest one
+        (and addresses that are not measured yet) and clearly slower addresses"""
+        # Read each RTT once, they may be updated (or forgotten) by other threads
+        rtts = self._rtts
+        scores = [(sockaddr, rtts.get(sockaddr[0])) for sockaddr in group]
+        measured = [state[0] for _, state in scores if state is not None]
+        if not measured:
+            return group, []
+
+        fastest = min(measured)
+        limit = max(fastest * (1 + self.rtt_tolerance), fastest + self.rtt_margin)
+
+        fast = []
+        slow = []
+        for sockaddr, state in scores:
+            if state is None or state[0] <= limit:
+                fast.append(sockaddr)
+            else:
+                slow.append((state[0], sockaddr))
+
+        # Clearly slower addresses are tried last, fastest first
+        slow.sort(key=lambda item: item[0])
+        return fast, [sockaddr for _, sockaddr in slow]
+
+    def _reorder(self, host, sockaddrs, by_rtt):
+        offset = self._next_offset(host)
+
+        groups = {}
+        for family, sockaddr in sockaddrs:
+            groups.setdefault(family, []).append(sockaddr)
+
+        # Reorder each family, keep the positions of families
+        iterators = {}
+        for family, group in groups.items():
+            slow = []
+            if by_rtt:
+                group, slow = self._split_by_rtt(group)
+
+            index = offset % len(group)
+            iterators[family] = iter(group[index:] + group[:index] + slow)
+
+        return [(family, next(iterators[family])) for family, _ in sockaddrs]
+
+    def order(self, host, sockaddrs):
+        """Return ``sockaddrs`` in the order they should be connected"""
+        if len(sockaddrs) > 1:
+            by_rtt = (
+                self.rtt_scoring
+                and bool(self._rtts)
+                and not (self.exploration and random.random() < self.exploration)
+            )
+            if by_rtt or self.rotate:
+                sockaddrs = self._reorder(host, sockaddrs, by_rtt)
+
+        if not self._quarantine:
+            return sockaddrs
+
+        now = monotonic()
+        healthy = []
+        quarantined = []
+        for item in sockaddrs:
+            if self.is_quarantined(item[1][0], now):
+                quarantined.append(item)
+            else:
+                healthy.append(item)
+
+        # Quarantined addresses are tried last, as the last resort
+        return healthy + quarantined
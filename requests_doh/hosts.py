@@ -0,0 +1,219 @@
+import logging
+import ipaddress
+
+from .addrselect import to_sockaddrs
+
+__all__ = (
+    'HostsTable', 'add_host_override', 'remove_host_override',
+    'get_host_override', 'clear_host_overrides', 'load_hosts_file',
+    'hosts'
+)
+
+log = logging.getLogger(__name__)
+
+def _normalize_host(host):
+    return host.rstrip(".").lower()
+
+def _check_addresses(addresses):
+    if isinstance(addresses, str):
+        addresses = (addresses,)
+
+    addresses = tuple(addresses)
+    if not addresses:
+        raise ValueError("`addresses` must not be empty")
+
+    for address in addresses:
+        try:
+            ipaddress.ip_address(address)
+        except ValueError:
+            raise ValueError(f"'{address}' is not an IP address")
+
+    return addresses
+
+class HostsTable:
+    """Static host overrides, hosts in this table are resolved to
+    fixed addresses without DoH queries and DNS cache
+
+    Entries are exact hosts (``example.com``) or wildcards (``*.example.com``)
+    that match every subdomain of the suffix, but not the suffix itself.
+    Exact entries are preferred, then the wildcard with the longest suffix.
+
+    Wildcards are indexed by their suffix, so a lookup costs one dictionary lookup
+    per label of the host regardless of the number of entries.
+    Addresses are stored with their parsed sockaddrs, so connections can use them directly.
+    """
+    def __init__(self):
+        self._exact = {}
+        self._wildcards = {}
+
+    def __len__(self):
+        return len(self._exact) + len(self._wildcards)
+
+    def _table(self, host):
+        host = _normalize_host(host)
+        if host.startswith("*."):
+            return self._wildcards, host[2:]
+
+        return self._exact, host
+
+    def add(self, host, addresses):
+        """Same as :func:`add_host_override`"""
+        addresses = _check_addresses(addresses)
+        table, key = self._table(host)
+        table[key] = (addresses, to_sockaddrs(addresses)[0])
+
+    def remove(self, host):
+        """Same as :func:`remove_host_override`"""
+        table, key = self._table(host)
+        try:
+            del table[key]
+        except KeyError:
+            raise ValueError(f"host '{host}' is not overridden")
+
+    def clear(self):
+        """Same as :func:`clear_host_overrides`"""
+        self._exact = {}
+        self._wildcards = {}
+
+    def _find(self, host):
+        if not self._exact and not self._wildcards:
+            return None
+
+        host = _normalize_host(host)
+        entry = self._exact.get(host)
+        if entry is not None or not self._wildcards:
+            return entry
+
+        # Try the longest suffix first, "a.b.example.com" -> "b.example.com" -> "example.com" -> "com"
+        index = host.find(".")
+        while index != -1:
+            entry = self._wildcards.get(host[index + 1:])
+            if entry is not None:
+                return entry
+            index = host.find(".", index + 1)
+
+        return None
+
+    def get(self, host):
+        """Same as :func:`get_host_override`"""
+        entry = self._find(host)
+        return None if entry is None else entry[0]
+
+    def get_sockaddrs(self, host):
+        """Return overridden addresses of ``host`` as ``(family, sockaddr)`` tuples,
+        ``None`` if it's not overridden"""
+        entry = self._find(host)
+        return None if entry is None else entry[1]
+
+    def load(self, path):
+        """Same as :func:`load_hosts_file`"""
+        exact = {}
+        wildcards = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, start=1):
+                line = line.split("#", 1)[0].split()
+                if len(line) < 2:
+                    continue
+
+                address, names = line[0], line[1:]
+                try:
+                    ipaddress.ip_address(address)
+                except ValueError:
+                    log.warning(f"Invalid address '{address}' in hosts file {path} (line {lineno})")
+                    continue
+
+                for name in names:
+                    name = _normalize_host(name)
+                    if name.startswith("*."):
+                        table, key = wildcards, name[2:]
+                    else:
+                        table, key = exact, name
+
+                    # Same host on multiple lines (IPv4 and IPv6 addresses)
+                    addresses = table.get(key, ())
+                    if address not in addresses:
+                        table[key] = addresses + (address,)
+
+        for table in (exact, wildcards):
+            for key, addresses in table.items():
+                table[key] = (addresses, to_sockaddrs(addresses)[0])
+
+        # Replace entries in bulk, so lookups never see half loaded file
+        self._exact = {**self._exact, **exact}
+        self._wildcards = {**self._wildcards, **wildcards}
+
+        return len(exact) + len(wildcards)
+
+hosts = HostsTable()
+
+def add_host_override(host, addresses):
+    """Resolve ``host`` to ``addresses`` without DoH queries
+
+    Overridden hosts are checked before DNS cache and never expire.
+
+    Parameters
+    -----------
+    host: :class:`str`
+        A host or a wildcard (``*.example.com``) that matches
+        every subdomain of ``example.com``
+    addresses: Union[:class:`str`, list[:class:`str`]]
+        IP addresses of the host
+
+    Raises
+    -------
+    ValueError
+        ``addresses`` is empty or one of them is not an IP address
+    """
+    hosts.add(host, addresses)
+
+def remove_host_override(host):
+    """Remove an overridden host
+
+    Parameters
+    -----------
+    host: :class:`str`
+        A host or a wildcard that was added with :func:`add_host_override`
+
+    Raises
+    -------
+    ValueError
+        ``host`` is not overridden
+    """
+    hosts.remove(host)
+
+def get_host_override(host):
+    """
+    Parameters
+    -----------
+    host: :class:`str`
+        A host
+
+    Return
+    -------
+    Optional[tuple[str]]
+        Return overridden addresses of ``host``, ``None`` if it's not overridden
+    """
+    return hosts.get(host)
+
+def clear_host_overrides():
+    """Remove all overridden hosts"""
+    hosts.clear()
+
+def load_hosts_file(path):
+    """Load overridden hosts from a hosts file (``/etc/hosts`` format)
+
+    Each line contains an IP address followed by one or more hosts,
+    hosts can be wildcards (``*.example.com``).
+    Comments (``#``) and lines with invalid addresses are ignored.
+
+    Parameters
+    -----------
+    path: :class:`str`
+        Path to hosts file
+
+    Return
+    -------
+    int
+        Return number of hosts loaded from the file
+    """
+    return hosts.load(path)
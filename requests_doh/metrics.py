@@ -0,0 +1,207 @@
+import threading
+
+__all__ = (
+    'enable_metrics', 'get_metrics', 'reset_metrics',
+    'add_metrics_observer', 'remove_metrics_observer'
+)
+
+# Upper bounds (in seconds) of query latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+class _Histogram:
+    __slots__ = ('count', 'sum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+                break
+
+    def snapshot(self):
+        # Cumulative bucket counts, same as Prometheus histogram
+        buckets = {}
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            total += count
+            buckets[bound] = total
+
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+class Metrics:
+    """Counters, histograms and gauges of the DoH resolver and DNS cache
+
+    All recording methods must be called only when :attr:`enabled` is ``True``,
+    so disabled metrics cost a single attribute check.
+
+    Observers are called with ``(event, value, labels)`` for each recorded metric,
+    where ``event`` is one of ``cache_hit``, ``cache_stale_hit``, ``cache_negative_hit``,
+    ``cache_miss``, ``cache_expiration``, ``cache_eviction``, ``query_latency``,
+    ``query_error`` and ``queries_in_flight``.
+
+    Cache events are labeled with the host only if :attr:`host_labels` is ``True``,
+    hosts are unbounded and would blow up label cardinality of metrics exporters.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.host_labels = False
+        self._lock = threading.Lock()
+        self._observers = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._cache = {
+                "hits": 0,
+                "stale_hits": 0,
+                "negative_hits": 0,
+                "misses": 0,
+                "expirations": 0,
+                "evictions": 0,
+            }
+            self._latency = {}
+            self._rcode_errors = {}
+            self._exception_errors = {}
+            self._in_flight = 0
+
+    def add_observer(self, observer):
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def _notify(self, event, value, labels):
+        for observer in self._observers:
+            observer(event, value, labels)
+
+    def cache_event(self, event, host):
+        key = {
+            "cache_hit": "hits",
+            "cache_stale_hit": "stale_hits",
+            "cache_negative_hit": "negative_hits",
+            "cache_miss": "misses",
+            "cache_expiration": "expirations",
+            "cache_eviction": "evictions",
+        }[event]
+        with self._lock:
+            self._cache[key] += 1
+
+        self._notify(event, 1, {"host": host} if self.host_labels else {})
+
+    def query_started(self):
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+
+        self._notify("queries_in_flight", in_flight, {})
+
+    def query_finished(self, provider, rdatatype, latency, error=None):
+        labels = {"provider": provider, "rdatatype": rdatatype}
+        with self._lock:
+            self._in_flight -= 1
+            in_flight = self._in_flight
+
+            if error is None:
+                key = (provider, rdatatype)
+                histogram = self._latency.get(key)
+                if histogram is None:
+                    histogram = self._latency[key] = _Histogram()
+                histogram.observe(latency)
+            elif getattr(error, "rcode", None) is not None:
+                labels["rcode"] = error.rcode.name
+                self._rcode_errors[error.rcode.name] = self._rcode_errors.get(error.rcode.name, 0) + 1
+            else:
+                name = error.__class__.__name__
+                labels["exception"] = name
+                self._exception_errors[name] = self._exception_errors.get(name, 0) + 1
+
+        self._notify("queries_in_flight", in_flight, {})
+        if error is None:
+            self._notify("query_latency", latency, labels)
+        else:
+            self._notify("query_error", 1, labels)
+
+    def snapshot(self):
+        with self._lock:
+            latency = {}
+            for (provider, rdatatype), histogram in self._latency.items():
+                latency.setdefault(provider, {})[rdatatype] = histogram.snapshot()
+
+            return {
+                "cache": dict(self._cache),
+                "queries": {
+                    "in_flight": self._in_flight,
+                    "latency": latency,
+                },
+                "errors": {
+                    "rcode": dict(self._rcode_errors),
+                    "exception": dict(self._exception_errors),
+                },
+            }
+
+metrics = Metrics()
+
+def enable_metrics(enabled=True, host_labels=False):
+    """Enable or disable metrics of DoH resolvers and DNS caches
+
+    Metrics are disabled by default.
+
+    Parameters
+    -----------
+    enabled: :class:`bool`
+        If ``True``, metrics are recorded
+    host_labels: :class:`bool`
+        If ``True``, cache events passed to metrics observers are labeled 
+        with the host (``{"host": host}``). Only enable it if the number of hosts 
+        is small, every host becomes a separate time series in Prometheus, StatsD, etc
+    """
+    metrics.enabled = enabled
+    metrics.host_labels = host_labels
+
+def get_metrics():
+    """
+    Return
+    -------
+    dict
+        Return a snapshot of metrics, it contains DNS cache counters
+        (hits, stale hits, negative hits, misses, expirations and evictions),
+        number of DNS queries in flight, cumulative latency histograms
+        (in seconds) per DoH provider and record type,
+        and number of errors per rcode and per exception type
+    """
+    return metrics.snapshot()
+
+def reset_metrics():
+    """Reset all metrics to zero"""
+    metrics.reset()
+
+def add_metrics_observer(observer):
+    """Add a metrics observer, it can be used to export metrics
+    to Prometheus, StatsD, etc
+
+    The observer is called every time a metric is recorded with
+    ``observer(event, value, labels)``, see :class:`requests_doh.metrics.Metrics`
+    for available events.
+
+    Parameters
+    -----------
+    observer: Callable[[:class:`str`, :class:`float`, :class:`dict`], None]
+        A metrics observer
+    """
+    metrics.add_observer(observer)
+
+def remove_metrics_observer(observer):
+    """Remove a metrics observer
+
+    Parameters
+    -----------
+    observer: Callable[[:class:`str`, :class:`float`, :class:`dict`], None]
+        A metrics observer added with :func:`add_metrics_observer`
+    """
+    metrics.remove_observer(observer)
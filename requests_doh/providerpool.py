@@ -0,0 +1,149 @@
+import threading
+from time import monotonic
+
+# Failed query is counted as a query with this latency (in seconds)
+_FAILURE_PENALTY = 1.0
+
+class _ProviderState:
+    __slots__ = (
+        'name', 'endpoint', 'latency', 'error_rate',
+        'failures', 'opened_at', 'probing'
+    )
+
+    def __init__(self, name, endpoint):
+        self.name = name
+        self.endpoint = endpoint
+        # Rolling average of query latency in seconds, ``None`` if it's never queried
+        self.latency = None
+        # Rolling average of failed queries (0.0 - 1.0)
+        self.error_rate = 0.0
+        # Consecutive failures
+        self.failures = 0
+        # When the circuit breaker is opened, ``None`` if it's closed
+        self.opened_at = None
+        # Half-open circuit breaker is sending a probe query
+        self.probing = False
+
+    def score(self):
+        if self.latency is None:
+            # Never queried, try it first
+            return 0.0
+
+        # Each 10% of error rate make the provider look 2x slower
+        return self.latency * (1 + 10 * self.error_rate)
+
+class ProviderPool:
+    """A pool of DoH providers with latency scoring and circuit breaking
+
+    Queries are sent to the provider with the best score
+    (rolling latency weighted by rolling error rate).
+    When a provider fails ``failure_threshold`` times in a row,
+    its circuit breaker is opened and it won't be used for ``recovery_time`` seconds.
+    After that, the circuit breaker is half-opened and a single probe query is sent to it,
+    if it's succeeded the circuit breaker is closed, otherwise it's opened again.
+
+    Queries that are not answered within ``timeout`` seconds are counted as failures.
+    """
+    def __init__(self, providers, failure_threshold=3, recovery_time=30, smoothing=0.2, timeout=None):
+        if not providers:
+            raise ValueError("`providers` must not be empty")
+
+        self._states = [_ProviderState(name, endpoint) for name, endpoint in providers]
+        self._failure_threshold = failure_threshold
+        self._recovery_time = recovery_time
+        self._smoothing = smoothing
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def _available(self, state, now):
+        if state.opened_at is None:
+            return True
+
+        # Half-open, only one probe query at a time
+        return not state.probing and state.opened_at + self._recovery_time <= now
+
+    def best(self, exclude=()):
+        """Return the provider state with the best score without claiming it,
+        ``None`` if all providers are excluded"""
+        now = monotonic()
+        candidates = [i for i in self._states if i.endpoint not in exclude]
+        if not candidates:
+            return None
+
+        available = [i for i in candidates if self._available(i, now)]
+        if not available:
+            # All circuit breakers are opened, use the one that was opened first
+            return min(candidates, key=lambda i: i.opened_at)
+
+        for state in available:
+            if state.opened_at is not None:
+                # Half-open, send a probe query to check whether it's recovered
+                # (if it's failed, the query will be retried with the next provider)
+                return state
+
+        return min(available, key=lambda i: i.score())
+
+    def select(self, exclude=()):
+        """Return the provider state that should be queried,
+        ``None`` if all providers are excluded"""
+        with self._lock:
+            state = self.best(exclude)
+            if state is not None and state.opened_at is not None:
+                state.probing = True
+
+            return state
+
+    def _update(self, state, latency, failed):
+        a = self._smoothing
+        if state.latency is None:
+            state.latency = latency
+        else:
+            state.latency = a * latency + (1 - a) * state.latency
+
+        state.error_rate = a * float(failed) + (1 - a) * state.error_rate
+
+    def record_success(self, state, latency):
+        with self._lock:
+            self._update(state, latency, False)
+            state.failures = 0
+            state.opened_at = None
+            state.probing = False
+
+    def record_failure(self, state):
+        with self._lock:
+            self._update(state, _FAILURE_PENALTY, True)
+            state.failures += 1
+
+            if state.probing or state.failures >= self._failure_threshold:
+                # Probe query is failed or too many failures, (re)open the circuit breaker
+                state.opened_at = monotonic()
+
+            state.probing = False
+
+    def release(self, state):
+        """Release the probe query of ``state`` without recording its result
+        (the query is cancelled), so the provider can be probed again"""
+        with self._lock:
+            state.probing = False
+
+    def stats(self):
+        """Return rolling latency, error rate and circuit breaker state of each provider"""
+        now = monotonic()
+        stats = {}
+        with self._lock:
+            for state in self._states:
+                if state.opened_at is None:
+                    breaker = "closed"
+                elif state.opened_at + self._recovery_time <= now:
+                    breaker = "half-open"
+                else:
+                    breaker = "open"
+
+                stats[state.name] = {
+                    "endpoint": state.endpoint,
+                    "latency": state.latency,
+                    "error_rate": state.error_rate,
+                    "circuit_breaker": breaker,
+                }
+
+        return stats
@@ -1,16 +1,50 @@
+import base64
+import asyncio
+import weakref
+import threading
+import socket
+import ipaddress
+import urllib.parse
 import requests
-from dns.message import make_query
+from time import monotonic, time as _now
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+    wait as wait_futures,
+    FIRST_COMPLETED
+)
+from dns.message import make_query, from_wire
 from dns.rdatatype import RdataType
-from dns.query import https as query_https
+from dns.query import BadResponse
 from dns.rcode import Rcode
+from dns.ttl import MAX_TTL
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    import httpx
+except ImportError:
+    # httpx is optional, only needed by async resolver and HTTP/2 transport
+    httpx = None
 
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+from .cachemanager import cachemanager, DNSCacheManager
+from .hosts import hosts as _hosts, HostsTable
+from .addrselect import sort_addresses, to_sockaddrs
+from .health import AddressHealth
+from .providerpool import ProviderPool
+from .metrics import metrics
 from .exceptions import (
-    DNSQueryFailed, 
+    DNSQueryFailed,
     DoHProviderNotExist,
     NoDoHProvider
 )
 
-_resolver_session = None # type: requests.Session
 _available_providers = {
     "cloudflare": "https://cloudflare-dns.com/dns-query",
     "cloudflare-security": "https://security.cloudflare-dns.com/dns-query",
@@ -24,77 +58,1366 @@ _available_providers = {
     "quad9-unsecured": "https://dns10.quad9.net/dns-query",
     "google": "https://dns.google/dns-query"
 }
-# Default provider
-_provider = _available_providers["cloudflare"]
+
+# IP addresses of DoH provider hostnames, so they can be connected
+# without resolving them with the system resolver
+_bootstrap_addresses = {
+    "cloudflare-dns.com": ("1.1.1.1", "1.0.0.1", "2606:4700:4700::1111", "2606:4700:4700::1001"),
+    "security.cloudflare-dns.com": ("1.1.1.2", "1.0.0.2", "2606:4700:4700::1112", "2606:4700:4700::1002"),
+    "family.cloudflare-dns.com": ("1.1.1.3", "1.0.0.3", "2606:4700:4700::1113", "2606:4700:4700::1003"),
+    "doh.opendns.com": ("146.112.41.2", "2620:119:fc::2"),
+    "doh.familyshield.opendns.com": ("146.112.41.3", "2620:119:fc::3"),
+    "dns.adguard.com": ("94.140.14.14", "94.140.15.15", "2a10:50c0::ad1:ff", "2a10:50c0::ad2:ff"),
+    "dns-family.adguard.com": ("94.140.14.15", "94.140.15.16", "2a10:50c0::bad1:ff", "2a10:50c0::bad2:ff"),
+    "unfiltered.adguard-dns.com": ("94.140.14.140", "94.140.14.141", "2a10:50c0::1:ff", "2a10:50c0::2:ff"),
+    "dns.quad9.net": ("9.9.9.9", "149.112.112.112", "2620:fe::fe", "2620:fe::9"),
+    "dns10.quad9.net": ("9.9.9.10", "149.112.112.10", "2620:fe::10", "2620:fe::fe:10"),
+    "dns.google": ("8.8.8.8", "8.8.4.4", "2001:4860:4860::8888", "2001:4860:4860::8844"),
+}
+
+# Hosts (and their subdomains) that are resolved with the system resolver
+_DEFAULT_NO_DOH = ("localhost", "local")
+
+# Hedged queries
+_HEDGE_DEFAULT_DELAY = 0.1
+_HEDGE_MIN_SAMPLES = 20
 
 __all__ = (
-    'set_resolver_session', 'get_resolver_session',
+    'Resolver', 'get_default_resolver',
+    'set_resolver_session', 'get_resolver_session', 'set_resolver_http2',
+    'set_dns_query_method', 'get_dns_query_method',
+    'set_no_doh_hosts', 'get_no_doh_hosts',
+    'set_address_quarantine', 'set_address_rotation', 'get_quarantined_addresses',
+    'set_address_rtt_scoring', 'get_address_stats',
     'set_dns_provider', 'get_dns_provider',
-    'add_dns_provider', 'remove_dns_provider', 
-    'get_all_dns_provider', 'resolve_dns'
+    'set_dns_provider_pool', 'get_dns_provider_pool_stats',
+    'add_dns_provider', 'remove_dns_provider',
+    'get_all_dns_provider', 'set_dns_hedging', 'get_dns_hedging_stats',
+    'resolve_dns', 'resolve_dns_async', 'resolve_many',
+    'set_resolver_async_session', 'get_resolver_async_session',
 )
 
-def set_resolver_session(session):
+def _negative_ttl(result):
+    # resolve_chaining() will use SOA TTL and SOA minimum for negative answers,
+    # if there is no SOA record it stays at MAX_TTL
+    if result.minimum_ttl >= MAX_TTL:
+        return None
+
+    return result.minimum_ttl
+
+def _response_max_age(headers):
+    """Return how long (in seconds) the DoH response is fresh according to
+    ``Cache-Control: max-age`` and ``Age`` headers, ``None`` if there is no ``max-age``"""
+    max_age = None
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "max-age":
+            try:
+                max_age = int(value.strip('"'))
+            except ValueError:
+                return None
+
+    if max_age is None:
+        return None
+
+    try:
+        age = int(headers.get("age", 0))
+    except ValueError:
+        age = 0
+
+    # Response served by HTTP cache is older than its TTLs (RFC 8484 section 5.1)
+    return max(max_age - age, 0)
+
+def _limit_ttl(ttl, max_age):
+    if ttl is None or max_age is None:
+        return ttl
+
+    return min(ttl, max_age)
+
+def _name_to_host(name):
+    return name.to_text(omit_final_dot=True).lower()
+
+def _parse_response(res_message, host, rdatatype, max_age=None):
+    rcode = Rcode(res_message.rcode())
+    if rcode != Rcode.NOERROR:
+        ttl = None
+        if rcode == Rcode.NXDOMAIN:
+            ttl = _limit_ttl(_negative_ttl(res_message.resolve_chaining()), max_age)
+
+        raise DNSQueryFailed(
+            f"Failed to query DNS {rdatatype.name} from host '{host}' (rcode = {rcode.name}",
+            rcode=rcode,
+            ttl=ttl
+        )
+
+    result = res_message.resolve_chaining()
+
+    # CNAME links followed to get to the answer, (alias, target, TTL)
+    chain = tuple(
+        (
+            _name_to_host(rrset.name),
+            _name_to_host(rrset[0].target),
+            _limit_ttl(rrset.ttl, max_age)
+        )
+        for rrset in result.cnames
+    )
+
+    if result.answer is None:
+        return None, _limit_ttl(_negative_ttl(result), max_age), chain
+
+    # TTL of the address records only, TTL of CNAME links are in the chain
+    return tuple(str(i) for i in result.answer), _limit_ttl(result.answer.ttl, max_age), chain
+
+def _make_request(host, rdatatype, post):
+    """Return DNS query message and keyword arguments of the HTTP request"""
+    req_message = make_query(host, rdatatype)
+    headers = {"accept": "application/dns-message"}
+
+    if post:
+        headers["content-type"] = "application/dns-message"
+        return req_message, {"headers": headers, "data": req_message.to_wire()}
+
+    # Message ID 0 makes the same query have the same URL,
+    # so it can be cached by HTTP caches (RFC 8484 section 4.1)
+    req_message.id = 0
+    wire = base64.urlsafe_b64encode(req_message.to_wire()).rstrip(b"=").decode()
+    return req_message, {"headers": headers, "params": {"dns": wire}}
+
+def _read_response(req_message, response, doh_endpoint):
+    status_code = response.status_code
+    if status_code < 200 or status_code > 299:
+        raise ValueError(
+            f"{doh_endpoint} responded with status code {status_code}"
+            f"\nResponse body: {response.content}"
+        )
+
+    res_message = from_wire(response.content)
+    if not req_message.is_response(res_message):
+        raise BadResponse
+
+    return res_message, _response_max_age(response.headers)
+
+def _send_query(session, doh_endpoint, host, rdatatype, post, timeout=None):
+    req_message, kwargs = _make_request(host, rdatatype, post)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    if httpx is not None and isinstance(session, httpx.Client) and post:
+        kwargs["content"] = kwargs.pop("data")
+
+    if post:
+        response = session.post(doh_endpoint, **kwargs)
+    else:
+        response = session.get(doh_endpoint, **kwargs)
+
+    res_message, max_age = _read_response(req_message, response, doh_endpoint)
+    return _parse_response(res_message, host, rdatatype, max_age)
+
+async def _send_query_async(session, doh_endpoint, host, rdatatype, post, timeout=None):
+    req_message, kwargs = _make_request(host, rdatatype, post)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    if post:
+        kwargs["content"] = kwargs.pop("data")
+        response = await session.post(doh_endpoint, **kwargs)
+    else:
+        response = await session.get(doh_endpoint, **kwargs)
+
+    res_message, max_age = _read_response(req_message, response, doh_endpoint)
+    return _parse_response(res_message, host, rdatatype, max_age)
+
+def _resolve(session, doh_endpoint, host, rdatatype, post=True, timeout=None):
+    if not metrics.enabled:
+        return _send_query(session, doh_endpoint, host, rdatatype, post, timeout)
+
+    metrics.query_started()
+    start = monotonic()
+    try:
+        result = _send_query(session, doh_endpoint, host, rdatatype, post, timeout)
+    except Exception as e:
+        metrics.query_finished(doh_endpoint, rdatatype.name, monotonic() - start, e)
+        raise
+
+    metrics.query_finished(doh_endpoint, rdatatype.name, monotonic() - start)
+    return result
+
+async def _resolve_async(session, doh_endpoint, host, rdatatype, post=True, timeout=None):
+    if not metrics.enabled:
+        return await _send_query_async(session, doh_endpoint, host, rdatatype, post, timeout)
+
+    metrics.query_started()
+    start = monotonic()
+    try:
+        result = await _send_query_async(session, doh_endpoint, host, rdatatype, post, timeout)
+    except BaseException as e:
+        # Cancelled tasks are counted too, so in flight gauge stays correct
+        metrics.query_finished(doh_endpoint, rdatatype.name, monotonic() - start, e)
+        raise
+
+    metrics.query_finished(doh_endpoint, rdatatype.name, monotonic() - start)
+    return result
+
+def _start_thread(name, func, *args):
+    """Call ``func`` in a new thread and return a future of its result,
+    unlike executors the call is never queued behind other calls"""
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+def _is_provider_failure(error):
+    """Return ``True`` if the failed DNS query is caused by the DoH provider
+    (SERVFAIL, REFUSED when it's throttling, ...), not by the queried host"""
+    return error.rcode is not None and error.rcode != Rcode.NXDOMAIN
+
+def _query_types():
+    """Return record types of address families that can be used by this host"""
+    if allowed_gai_family() == socket.AF_INET:
+        # IPv6 is not available
+        return (RdataType.A,)
+
+    return (RdataType.A, RdataType.AAAA)
+
+def _merge_answers(provider, host, results):
+    # Keep the order of answers from DoH provider (it may do round-robin)
+    answers = {}
+    ttls = []
+    negative_ttls = []
+
+    for rdatatype_answers, ttl, chain in results:
+        if rdatatype_answers is not None:
+            answers.update(dict.fromkeys(rdatatype_answers))
+            # Answers of an alias are valid as long as every link of its chain
+            ttls.extend(link_ttl for _, _, link_ttl in chain)
+            ttls.append(ttl)
+        elif ttl is not None:
+            negative_ttls.append(ttl)
+
+    if not answers:
+        raise DNSQueryFailed(
+            f"DNS server {provider} returned empty results from host '{host}'",
+            ttl=min(negative_ttls) if negative_ttls else None
+        )
+
+    return sort_addresses(answers), min(ttls)
+
+def _create_http2_session(cls):
+    if httpx is None or h2 is None:
+        raise RuntimeError(
+            "httpx and h2 are required to use HTTP/2 transport, "
+            "install them with `pip install httpx[http2]`"
+        )
+
+    return cls(http1=True, http2=True)
+
+def _check_bootstrap_addresses(addresses):
+    addresses = tuple(addresses)
+    for address in addresses:
+        try:
+            ipaddress.ip_address(address)
+        except ValueError:
+            raise ValueError(f"bootstrap address must be an IP address, not '{address}'")
+
+    return addresses
+
+def _parse_no_doh(hosts):
+    if hosts is None:
+        return frozenset()
+
+    if isinstance(hosts, str):
+        hosts = hosts.split(",")
+
+    # Same format as `no_proxy`, ".example.com" is same as "example.com"
+    return frozenset(
+        i.strip().strip(".").lower() for i in hosts if i.strip().strip(".")
+    )
+
+def _is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+
+    return True
+
+def _is_ip_literal(host):
+    # Only IP addresses have ":" or end with a digit (hostname labels can, but TLDs can't)
+    return (":" in host or host[-1:].isdigit()) and _is_ip_address(host)
+
+def _check_provider(providers, provider):
+    if provider not in providers.keys():
+        raise DoHProviderNotExist(f"invalid DoH provider, must be one of '{list(providers.keys())}'")
+
+class Resolver:
+    """A DoH (DNS over HTTPS) resolver
+
+    Each resolver has its own DoH providers, http sessions, DNS cache and settings,
+    so resolvers with different configurations don't affect each other.
+    Module-level functions (such as :func:`set_dns_provider` and :func:`resolve_dns`)
+    are using the default resolver, see :func:`get_default_resolver`.
+
+    A resolver can be used by :class:`DNSOverHTTPSAdapter` and :class:`DNSOverHTTPSSession`
+    with ``resolver`` parameter.
+
+    Parameters
+    -----------
+    provider: :class:`str`
+        A DoH provider, default to ``cloudflare``
+    providers: dict[:class:`str`, :class:`str`]
+        Available DoH providers (name and full URL),
+        default to copy of DoH providers of the default resolver
+    cache: :class:`DNSCacheManager`
+        DNS cache, if ``None`` the resolver will have its own DNS cache
+    hosts: :class:`HostsTable`
+        Static host overrides, if ``None`` the resolver will have its own empty table
+
+    Resolvers start threads and open http sessions when they're used,
+    call :meth:`close` (or use the resolver as a context manager) to release them.
+    """
+    def __init__(self, provider="cloudflare", providers=None, cache=None, hosts=None):
+        if providers is None:
+            providers = dict(_available_providers)
+
+        _check_provider(providers, provider)
+
+        self._available_providers = providers
+        self._provider = providers[provider]
+        self._bootstrap_addresses = dict(_bootstrap_addresses)
+        self.cache = cache if cache is not None else DNSCacheManager()
+        # Only the resolver's own DNS cache is closed by close()
+        self._cache_owned = cache is None
+        self.hosts = hosts if hosts is not None else HostsTable()
+        self.set_no_doh_hosts(_DEFAULT_NO_DOH)
+
+        # Rotation, quarantine and preferred address family of resolved addresses
+        self.address_health = AddressHealth()
+
+        self._session = None
+        # Bootstrap adapters are mounted on the session
+        self._session_bootstrap = False
+        # The session is created by the resolver, it's closed by close()
+        self._session_owned = False
+        self._http2 = False
+        self._post = True
+        self._async_sessions = weakref.WeakKeyDictionary()
+        # Event loops keep weak references to their tasks
+        self._async_session_closers = set()
+        self._executor_lock = threading.Lock()
+
+        # Provider pool, if it's set queries are sent to the best provider in the pool
+        self._provider_pool = None
+
+        # Hedged queries
+        self._hedge_provider = None
+        self._hedge_delay = None
+        self._hedge_executor = None
+        self._hedge_latencies = deque(maxlen=200)
+        self._hedge_lock = threading.Lock()
+        self._hedge_stats = {"queries": 0, "hedged": 0, "hedge_wins": 0}
+
+    def close(self):
+        """Shut down threads of the resolver and close http sessions 
+        and DNS cache created by the resolver
+
+        Sessions set with :meth:`set_session` and :meth:`set_async_session`, 
+        and DNS cache given to the resolver are not closed.
+        The resolver can still be used after it's closed, 
+        threads and sessions will be created again.
+        """
+        with self._executor_lock:
+            executor = self._hedge_executor
+            self._hedge_executor = None
+
+        if executor is not None:
+            # Running queries are finished in background
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        session = self._session
+        if session is not None and self._session_owned:
+            self._session = None
+            self._session_owned = False
+            session.close()
+
+        # Async sessions are closed in their own event loop
+        for task in list(self._async_session_closers):
+            loop = task.get_loop()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(task.cancel)
+
+        if self._cache_owned:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ==============
+    # Http sessions
+    # ==============
+
+    def set_session(self, session, bootstrap=False):
+        """Same as :func:`set_resolver_session`"""
+        if not (
+            isinstance(session, requests.Session)
+            or (httpx is not None and isinstance(session, httpx.Client))
+        ):
+            raise ValueError(
+                f"`session` must be `requests.Session` or `httpx.Client`, {session.__class__.__name__}"
+            )
+
+        self._session = session
+        self._session_owned = False
+        self._session_bootstrap = bootstrap and isinstance(session, requests.Session)
+
+        if self._session_bootstrap:
+            for address in self._available_providers.values():
+                self._mount_bootstrap(session, address)
+
+    def _mount_bootstrap(self, session, address):
+        """Connect to bootstrap addresses of DoH provider ``address``
+        instead of resolving its hostname with the system resolver"""
+        # Imported here to avoid circular import (connectors use the default resolver)
+        from .adapter import _BootstrapAdapter
+
+        url = urllib.parse.urlsplit(address)
+        prefix = f"{url.scheme}://{url.netloc}/"
+        addresses = self._bootstrap_addresses.get(url.hostname)
+        if addresses:
+            session.mount(prefix, _BootstrapAdapter(addresses))
+        elif isinstance(session.adapters.get(prefix), _BootstrapAdapter):
+            # Bootstrap addresses are removed
+            del session.adapters[prefix]
+
+    def get_session(self):
+        """Same as :func:`get_resolver_session`"""
+        return self._session
+
+    def set_http2(self, enabled=True):
+        """Same as :func:`set_resolver_http2`"""
+        if enabled:
+            session = _create_http2_session(httpx.Client)
+        else:
+            session = requests.Session()
+
+        self._http2 = enabled
+        self.set_session(session, bootstrap=True)
+        self._session_owned = True
+
+        # Async sessions will be recreated with new transport
+        self._async_sessions.clear()
+
+    def set_query_method(self, method):
+        """Same as :func:`set_dns_query_method`"""
+        method = method.upper()
+        if method not in ("GET", "POST"):
+            raise ValueError(f"`method` must be 'GET' or 'POST', not '{method}'")
+
+        self._post = method == "POST"
+
+    def get_query_method(self):
+        """Same as :func:`get_dns_query_method`"""
+        return "POST" if self._post else "GET"
+
+    def set_no_doh_hosts(self, hosts):
+        """Same as :func:`set_no_doh_hosts`"""
+        no_doh = _parse_no_doh(hosts)
+        self._no_doh_suffixes = tuple("." + i for i in no_doh)
+        self._no_doh = no_doh
+
+    def get_no_doh_hosts(self):
+        """Same as :func:`get_no_doh_hosts`"""
+        return tuple(sorted(self._no_doh))
+
+    def _is_no_doh(self, host):
+        no_doh = self._no_doh
+        if not no_doh:
+            return False
+
+        if "*" in no_doh:
+            return True
+
+        host = host.rstrip(".").lower()
+        return host in no_doh or host.endswith(self._no_doh_suffixes)
+
+    def _get_direct_answers(self, host):
+        """Return addresses of ``host`` if it must not be resolved with DoH
+        (IP address or one of ``no_doh`` hosts), otherwise ``None``"""
+        if _is_ip_literal(host):
+            return (host,)
+
+        if self._is_no_doh(host):
+            addrinfos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            return tuple(dict.fromkeys(i[4][0] for i in addrinfos))
+
+        return None
+
+    async def _get_direct_answers_async(self, host):
+        """Same as :meth:`_get_direct_answers`, but ``no_doh`` hosts 
+        are resolved without blocking the event loop"""
+        if _is_ip_literal(host):
+            return (host,)
+
+        if self._is_no_doh(host):
+            loop = asyncio.get_running_loop()
+            addrinfos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            return tuple(dict.fromkeys(i[4][0] for i in addrinfos))
+
+        return None
+
+    def _get_direct_sockaddrs(self, host):
+        """Same as :meth:`_get_direct_answers`, but return ``(family, sockaddr)`` tuples"""
+        if ":" in host or host[-1:].isdigit():
+            sockaddrs = to_sockaddrs((host,))[0]
+            if sockaddrs:
+                return sockaddrs
+
+        if self._is_no_doh(host):
+            addrinfos = socket.getaddrinfo(host, 0, type=socket.SOCK_STREAM)
+            return tuple(dict.fromkeys((i[0], i[4]) for i in addrinfos))
+
+        return None
+
+    def set_address_quarantine(self, backoff=1.0, max_backoff=60.0):
+        """Same as :func:`set_address_quarantine`"""
+        if backoff < 0 or max_backoff < 0:
+            raise ValueError("`backoff` and `max_backoff` must not be negative")
+
+        self.address_health.backoff = backoff
+        self.address_health.max_backoff = max_backoff
+
+    def set_address_rotation(self, enabled=True):
+        """Same as :func:`set_address_rotation`"""
+        self.address_health.rotate = enabled
+
+    def get_quarantined_addresses(self):
+        """Same as :func:`get_quarantined_addresses`"""
+        return self.address_health.get_quarantined()
+
+    def set_address_rtt_scoring(self, enabled=True, exploration=0.05):
+        """Same as :func:`set_address_rtt_scoring`"""
+        if not 0 <= exploration <= 1:
+            raise ValueError("`exploration` must be between 0 and 1")
+
+        self.address_health.rtt_scoring = enabled
+        self.address_health.exploration = exploration
+
+    def get_address_stats(self):
+        """Same as :func:`get_address_stats`"""
+        return self.address_health.get_stats()
+
+    def set_async_session(self, session):
+        """Same as :func:`set_resolver_async_session`"""
+        if httpx is None or not isinstance(session, httpx.AsyncClient):
+            raise ValueError(f"`session` must be `httpx.AsyncClient`, {session.__class__.__name__}")
+
+        self._async_sessions[asyncio.get_running_loop()] = session
+
+    def _create_async_session(self):
+        if self._http2:
+            session = _create_http2_session(httpx.AsyncClient)
+        else:
+            session = httpx.AsyncClient()
+
+        loop = asyncio.get_running_loop()
+        self._async_sessions[loop] = session
+
+        # Sessions created by the resolver are closed when the event loop is shutting down,
+        # asyncio.run() cancels the remaining tasks before it closes the event loop
+        task = loop.create_task(self._close_async_session(loop, session))
+        self._async_session_closers.add(task)
+        task.add_done_callback(self._async_session_closers.discard)
+        return session
+
+    async def _close_async_session(self, loop, session):
+        try:
+            await loop.create_future()
+        finally:
+            if self._async_sessions.get(loop) is session:
+                del self._async_sessions[loop]
+
+            await session.aclose()
+
+    def get_async_session(self):
+        """Same as :func:`get_resolver_async_session`"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+        return self._async_sessions.get(loop)
+
+    # ==============
+    # DoH providers
+    # ==============
+
+    def set_provider(self, provider):
+        """Same as :func:`set_dns_provider`"""
+        _check_provider(self._available_providers, provider)
+
+        self._provider = self._available_providers[provider]
+        self._provider_pool = None
+
+    def get_provider(self):
+        """Same as :func:`get_dns_provider`"""
+        pool = self._provider_pool
+        if pool is not None:
+            return pool.best().endpoint
+
+        return self._provider
+
+    def add_provider(self, name, address, switch=False, bootstrap_addresses=None):
+        """Same as :func:`add_dns_provider`"""
+        if bootstrap_addresses is not None:
+            hostname = urllib.parse.urlsplit(address).hostname
+            bootstrap_addresses = _check_bootstrap_addresses(bootstrap_addresses)
+            if bootstrap_addresses:
+                self._bootstrap_addresses[hostname] = bootstrap_addresses
+            else:
+                # Resolve the hostname with the system resolver again
+                self._bootstrap_addresses.pop(hostname, None)
+
+        self._available_providers[name] = address
+
+        if bootstrap_addresses is not None and self._session_bootstrap:
+            self._mount_bootstrap(self._session, address)
+
+        if switch:
+            self.set_provider(name)
+
+    def remove_provider(self, name, fallback=None):
+        """Same as :func:`remove_dns_provider`"""
+        try:
+            self._available_providers.pop(name)
+        except KeyError:
+            raise DoHProviderNotExist(
+                "DoH provider is not exist in list of available DoH providers"
+            )
+
+        if fallback:
+            self.set_provider(fallback)
+        else:
+            self._provider = None
+
+    def get_all_providers(self):
+        """Same as :func:`get_all_dns_provider`"""
+        return tuple(self._available_providers.keys())
+
+    def set_provider_pool(self, providers, failure_threshold=3, recovery_time=30, timeout=5.0):
+        """Same as :func:`set_dns_provider_pool`"""
+        if not providers:
+            self._provider_pool = None
+            return
+
+        for provider in providers:
+            _check_provider(self._available_providers, provider)
+
+        self._provider_pool = ProviderPool(
+            [(provider, self._available_providers[provider]) for provider in providers],
+            failure_threshold=failure_threshold,
+            recovery_time=recovery_time,
+            timeout=timeout
+        )
+
+    def get_provider_pool_stats(self):
+        """Same as :func:`get_dns_provider_pool_stats`"""
+        pool = self._provider_pool
+        if pool is None:
+            return {}
+
+        return pool.stats()
+
+    # ===============
+    # Hedged queries
+    # ===============
+
+    def set_hedging(self, provider, delay=None):
+        """Same as :func:`set_dns_hedging`"""
+        if provider is not None:
+            _check_provider(self._available_providers, provider)
+
+        self._hedge_provider = provider
+        self._hedge_delay = delay
+        self._hedge_latencies.clear()
+
+    def get_hedging_stats(self):
+        """Same as :func:`get_dns_hedging_stats`"""
+        with self._hedge_lock:
+            stats = dict(self._hedge_stats)
+
+        stats["hedge_rate"] = stats["hedged"] / stats["queries"] if stats["queries"] else 0.0
+        return stats
+
+    def _get_hedge_delay(self):
+        if self._hedge_delay is not None:
+            return self._hedge_delay
+
+        latencies = sorted(self._hedge_latencies)
+        if len(latencies) < _HEDGE_MIN_SAMPLES:
+            return _HEDGE_DEFAULT_DELAY
+
+        # 95th percentile
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _get_hedge_executor(self):
+        if self._hedge_executor is None:
+            with self._executor_lock:
+                if self._hedge_executor is None:
+                    # Hedged queries are sent only when the primary ones are slow,
+                    # so they can share a bounded executor
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=32,
+                        thread_name_prefix="requests_doh_hedge"
+                    )
+
+        return self._hedge_executor
+
+    def _timed_resolve(self, session, doh_endpoint, host, rdatatype):
+        start = monotonic()
+        result = _resolve(session, doh_endpoint, host, rdatatype, self._post)
+        self._hedge_latencies.append(monotonic() - start)
+        return result
+
+    def _hedged_resolve(self, session, doh_endpoint, host, rdatatype):
+        hedge_endpoint = self._available_providers.get(self._hedge_provider)
+        if hedge_endpoint is None or hedge_endpoint == doh_endpoint:
+            return _resolve(session, doh_endpoint, host, rdatatype, self._post)
+
+        # Primary query is started right now in its own thread,
+        # so the hedge delay doesn't include time spent waiting in a queue.
+        # The executor is used only for hedged queries
+        primary = _start_thread(
+            "requests_doh_primary", self._timed_resolve, session, doh_endpoint, host, rdatatype
+        )
+
+        with self._hedge_lock:
+            self._hedge_stats["queries"] += 1
+
+        try:
+            return primary.result(timeout=self._get_hedge_delay())
+        except FutureTimeoutError:
+            pass
+
+        hedged = self._get_hedge_executor().submit(_resolve, session, hedge_endpoint, host, rdatatype, self._post)
+        with self._hedge_lock:
+            self._hedge_stats["hedged"] += 1
+
+        done, pending = wait_futures((primary, hedged), return_when=FIRST_COMPLETED)
+        first = done.pop()
+        error = first.exception()
+        if error is not None and not isinstance(error, DNSQueryFailed):
+            # Use the other one if it's failed to send the query
+            # (DNSQueryFailed is a valid answer from DoH provider)
+            wait_futures((primary, hedged))
+            first = hedged if first is primary else primary
+        else:
+            for future in pending:
+                future.cancel()
+
+        if first is hedged:
+            error = hedged.exception()
+            if error is not None and not isinstance(error, DNSQueryFailed):
+                # Both are failed, raise error from active DoH provider
+                return primary.result()
+
+            with self._hedge_lock:
+                self._hedge_stats["hedge_wins"] += 1
+
+        return first.result()
+
+    # ===============
+    # Provider pool
+    # ===============
+
+    def _pooled_resolve(self, pool, session, host, rdatatype):
+        tried = set()
+        error = None
+        while True:
+            state = pool.select(exclude=tried)
+            if state is None:
+                raise error
+
+            start = monotonic()
+            try:
+                result = _resolve(session, state.endpoint, host, rdatatype, self._post, pool.timeout)
+            except DNSQueryFailed as e:
+                if _is_provider_failure(e):
+                    pool.record_failure(state)
+                    tried.add(state.endpoint)
+                    error = e
+                    continue
+
+                # DoH provider is working, the host is failed to be resolved
+                pool.record_success(state, monotonic() - start)
+                raise
+            except Exception as e:
+                # Including timeouts, a DoH provider that doesn't answer is failing
+                pool.record_failure(state)
+                tried.add(state.endpoint)
+                error = e
+                continue
+            except BaseException:
+                # Cancelled (or interrupted), don't leave the probe claimed forever
+                pool.release(state)
+                raise
+
+            pool.record_success(state, monotonic() - start)
+            return result
+
+    async def _pooled_resolve_async(self, pool, session, host, rdatatype):
+        tried = set()
+        error = None
+        while True:
+            state = pool.select(exclude=tried)
+            if state is None:
+                raise error
+
+            start = monotonic()
+            try:
+                result = await _resolve_async(
+                    session, state.endpoint, host, rdatatype, self._post, pool.timeout
+                )
+            except DNSQueryFailed as e:
+                if _is_provider_failure(e):
+                    pool.record_failure(state)
+                    tried.add(state.endpoint)
+                    error = e
+                    continue
+
+                # DoH provider is working, the host is failed to be resolved
+                pool.record_success(state, monotonic() - start)
+                raise
+            except Exception as e:
+                # Including timeouts, a DoH provider that doesn't answer is failing
+                pool.record_failure(state)
+                tried.add(state.endpoint)
+                error = e
+                continue
+            except BaseException:
+                # Cancelled (or interrupted), don't leave the probe claimed forever
+                pool.release(state)
+                raise
+
+            pool.record_success(state, monotonic() - start)
+            return result
+
+    # ==========
+    # Resolving
+    # ==========
+
+    def _resolve_dns(self, host):
+        """Resolve ``host`` and return tuple of answers and minimum TTL of the answers"""
+        pool = self._provider_pool
+        if self._provider is None and pool is None:
+            raise NoDoHProvider("There is no active DoH provider")
+
+        session = self.get_session()
+
+        if session is None:
+            session = requests.Session()
+            self.set_session(session, bootstrap=True)
+            self._session_owned = True
+
+        provider = self._provider
+
+        # Reuse is good
+        def query(rdatatype):
+            if pool is not None:
+                return self._pooled_resolve(pool, session, host, rdatatype)
+            elif self._hedge_provider is not None:
+                return self._hedged_resolve(session, provider, host, rdatatype)
+
+            return _resolve(session, provider, host, rdatatype, self._post)
+
+        if RdataType.AAAA not in _query_types():
+            results = (query(RdataType.A),)
+        else:
+            # Query AAAA type in its own thread while A type is queried here,
+            # so both queries are in flight together however many hosts are resolved at once
+            AAAA_FUTURE = _start_thread("requests_doh", query, RdataType.AAAA)
+
+            # Query A type
+            A_RESULT = query(RdataType.A)
+            AAAA_RESULT = AAAA_FUTURE.result()
+
+            results = (A_RESULT, AAAA_RESULT)
+
+        answers, ttl = _merge_answers(self.get_provider(), host, results)
+        self._cache_chain(answers, results)
+        return answers, ttl
+
+    async def _resolve_dns_async(self, host):
+        """Same as :meth:`_resolve_dns`, but asynchronous"""
+        pool = self._provider_pool
+        if self._provider is None and pool is None:
+            raise NoDoHProvider("There is no active DoH provider")
+
+        if httpx is None:
+            raise RuntimeError("httpx is required to resolve DNS asynchronously")
+
+        session = self.get_async_session()
+
+        if session is None:
+            session = self._create_async_session()
+
+        provider = self._provider
+
+        async def query(rdatatype):
+            if pool is not None:
+                return await self._pooled_resolve_async(pool, session, host, rdatatype)
+
+            return await _resolve_async(session, provider, host, rdatatype, self._post)
+
+        results = await asyncio.gather(
+            *(query(rdatatype) for rdatatype in _query_types()),
+            return_exceptions=True
+        )
+
+        # Same as synchronous resolver, error from A query is raised first
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        answers, ttl = _merge_answers(self.get_provider(), host, results)
+        self._cache_chain(answers, results)
+        return answers, ttl
+
+    def _cache_chain(self, answers, results):
+        """Cache CNAME links of the results, and the answers under 
+        their canonical name with TTL of the address records"""
+        canonical_names = set()
+        ttls = []
+        for rdatatype_answers, ttl, chain in results:
+            for alias, target, link_ttl in chain:
+                self.cache.set_cname(alias, target, link_ttl)
+
+            if rdatatype_answers is not None:
+                canonical_names.add(chain[-1][1] if chain else None)
+                ttls.append(ttl)
+
+        # A and AAAA answers must be from the same canonical name
+        if len(canonical_names) == 1 and None not in canonical_names:
+            self.cache.set_cache(canonical_names.pop(), answers, min(ttls))
+
+    def _resolve_alias(self, host):
+        """Same as :meth:`_resolve_dns`, but if ``host`` is a cached alias 
+        it's resolved from the cached answers of its CNAME target"""
+        link = self.cache.get_cname(host)
+        if link is None:
+            return self._resolve_dns(host)
+
+        target, expire = link
+        entry = self.cache.get_or_resolve_entry(target, self._resolve_dns)
+        return entry.answers, max(min(expire, entry.expire) - _now(), 0)
+
+    async def _resolve_alias_async(self, host):
+        """Same as :meth:`_resolve_alias`, but asynchronous"""
+        link = self.cache.get_cname(host)
+        if link is None:
+            return await self._resolve_dns_async(host)
+
+        target, expire = link
+        entry = await self.cache.get_or_resolve_entry_async(target, self._resolve_dns_async)
+        return entry.answers, max(min(expire, entry.expire) - _now(), 0)
+
+    def resolve(self, host):
+        """Same as :func:`resolve_dns`"""
+        answers, _ = self._resolve_dns(host)
+        return answers
+
+    async def resolve_async(self, host):
+        """Same as :func:`resolve_dns_async`"""
+        addresses = await self._get_direct_answers_async(host)
+        if addresses is not None:
+            return list(addresses)
+
+        addresses = self.hosts.get(host)
+        if addresses is not None:
+            return list(addresses)
+
+        return list(await self.cache.get_or_resolve_async(host, self._resolve_alias_async))
+
+    def resolve_many(self, hosts, concurrency=8):
+        """Same as :func:`resolve_many`"""
+        if concurrency < 1:
+            raise ValueError("`concurrency` must be greater than 0")
+
+        results = {}
+        uncached = []
+        for host in dict.fromkeys(hosts):
+            answers = self.hosts.get(host) or self.cache.get_cache(host)
+            if answers:
+                results[host] = list(answers)
+            else:
+                uncached.append(host)
+
+        def resolve(host):
+            try:
+                return list(self._get_answers(host))
+            except Exception as e:
+                return e
+
+        if uncached:
+            with ThreadPoolExecutor(
+                max_workers=min(concurrency, len(uncached)),
+                thread_name_prefix="requests_doh_many"
+            ) as executor:
+                results.update(zip(uncached, executor.map(resolve, uncached)))
+
+        return results
+
+    def _get_answers(self, host):
+        """Return cached answers of ``host``,
+        if it's not cached it will be resolved and cached with TTL returned by DoH provider.
+        Overridden hosts are returned without looking at the cache, 
+        IP addresses and ``no_doh`` hosts are returned without DoH queries"""
+        addresses = self._get_direct_answers(host)
+        if addresses is not None:
+            return addresses
+
+        addresses = self.hosts.get(host)
+        if addresses is not None:
+            return addresses
+
+        return self.cache.get_or_resolve(host, self._resolve_alias)
+
+    def _get_sockaddrs(self, host):
+        """Same as :meth:`_get_answers`, but return ``(family, sockaddr)`` tuples 
+        of the addresses (port is 0), CNAME targets are not included"""
+        sockaddrs = self._get_direct_sockaddrs(host)
+        if sockaddrs is not None:
+            return sockaddrs
+
+        sockaddrs = self.hosts.get_sockaddrs(host)
+        if sockaddrs is not None:
+            return sockaddrs
+
+        return self.cache.get_or_resolve_entry(host, self._resolve_alias).sockaddrs
+
+# The default resolver uses the global DoH providers and DNS cache
+_default_resolver = Resolver(providers=_available_providers, cache=cachemanager, hosts=_hosts)
+
+def get_default_resolver():
+    """
+    Return
+    -------
+    Resolver
+        Return the default resolver used by module-level functions
+        and sessions that have no ``resolver`` set
+    """
+    return _default_resolver
+
+def set_resolver_session(session, bootstrap=False):
     """Set http session to resolve DNS
 
     Parameters
     -----------
-    session: :class:`requests.Session`
+    session: Union[:class:`requests.Session`, :class:`httpx.Client`]
         An http session to resolve DNS
+    bootstrap: :class:`bool`
+        If ``True``, adapters that connect to bootstrap addresses of DoH providers 
+        are mounted on ``session`` (replacing adapters mounted for DoH provider URLs).
+        Only :class:`requests.Session` is supported.
+        By default, ``session`` is used as it is and DoH provider hostnames 
+        are resolved with the system resolver
 
     Raises
     -------
     ValueError
-        ``session`` parameter is not :class:`requests.Session` instance    
+        ``session`` parameter is not :class:`requests.Session` or :class:`httpx.Client` instance
     """
-    global _resolver_session
+    _default_resolver.set_session(session, bootstrap)
 
-    if not isinstance(session, requests.Session):
-        raise ValueError(f"`session` must be `requests.Session`, {session.__class__.__name__}")
-    
-    _resolver_session = session
-
-def get_resolver_session() -> requests.Session:
+def get_resolver_session():
     """
     Return
     -------
-    requests.Session
+    Union[requests.Session, httpx.Client]
         Return an http session for DoH resolver
     """
-    return _resolver_session
+    return _default_resolver.get_session()
+
+def set_resolver_http2(enabled=True):
+    """Use HTTP/2 to send DoH queries
+
+    With HTTP/2, DoH queries from many threads (and async tasks)
+    are multiplexed in a single connection to DoH provider
+    instead of opening a connection for each concurrent query.
+    This will replace current http session for DoH resolver
+    (see :func:`set_resolver_session`).
+
+    Parameters
+    -----------
+    enabled: :class:`bool`
+        If ``True``, HTTP/2 (with :class:`httpx.Client`) is used,
+        otherwise HTTP/1.1 (with :class:`requests.Session`) is used
+
+    Raises
+    -------
+    RuntimeError
+        ``httpx`` or ``h2`` is not installed
+    """
+    _default_resolver.set_http2(enabled)
+
+def set_dns_query_method(method):
+    """Set HTTP method of DoH queries, default to ``POST``
+
+    ``GET`` queries are sent with DNS message ID 0, so the same query
+    always has the same URL and it can be cached by HTTP caches
+    (like caching proxies) between the resolver and DoH provider (RFC 8484 section 4.1).
+
+    Regardless of the method, TTLs of DoH responses are limited by
+    ``Cache-Control: max-age`` minus ``Age`` of the HTTP response,
+    so answers served by HTTP caches are not cached longer than they're fresh.
+
+    Parameters
+    -----------
+    method: :class:`str`
+        ``GET`` or ``POST``
+
+    Raises
+    -------
+    ValueError
+        ``method`` is not ``GET`` or ``POST``
+    """
+    _default_resolver.set_query_method(method)
+
+def get_dns_query_method():
+    """
+    Return
+    -------
+    str
+        Return HTTP method of DoH queries
+    """
+    return _default_resolver.get_query_method()
+
+def set_no_doh_hosts(hosts):
+    """Set hosts that are connected without DoH queries, 
+    they're resolved with the system resolver instead
+
+    The format is same as ``no_proxy`` environment variable, 
+    each host matches itself and its subdomains, and ``*`` matches every host.
+    Default to ``localhost`` and ``local``.
+
+    IP addresses are always connected directly without DoH queries.
+
+    Parameters
+    -----------
+    hosts: Union[:class:`str`, list[:class:`str`]]
+        Comma separated string or list of hosts, 
+        ``None`` or empty list to resolve every host with DoH
+    """
+    _default_resolver.set_no_doh_hosts(hosts)
+
+def get_no_doh_hosts():
+    """
+    Return
+    -------
+    tuple[str]
+        Return hosts that are connected without DoH queries
+    """
+    return _default_resolver.get_no_doh_hosts()
+
+def set_address_quarantine(backoff=1.0, max_backoff=60.0):
+    """Set quarantine period of addresses that failed to connect
+
+    Quarantined addresses are tried after the other addresses of the host
+    until their quarantine period is over. The period starts at ``backoff`` seconds
+    and it's doubled on each consecutive failure, up to ``max_backoff`` seconds.
+    The address is released after it connected successfully.
+
+    Parameters
+    -----------
+    backoff: :class:`float`
+        Quarantine period in seconds after the first failure, ``0`` to disable quarantine
+    max_backoff: :class:`float`
+        Maximum quarantine period in seconds
+
+    Raises
+    -------
+    ValueError
+        ``backoff`` or ``max_backoff`` is negative
+    """
+    _default_resolver.set_address_quarantine(backoff, max_backoff)
+
+def set_address_rotation(enabled=True):
+    """Enable or disable rotation of resolved addresses
+
+    If it's enabled (the default), every new connection to a host starts from
+    the next address of the host, so the load is spread across all of them.
+    Addresses are rotated within their address family, 
+    so the preferred address family is still tried first.
+    If RTT scoring is enabled (see :func:`set_address_rtt_scoring`), 
+    clearly slower addresses are tried after the rotated ones.
+
+    Parameters
+    -----------
+    enabled: :class:`bool`
+        If ``True``, addresses are rotated
+    """
+    _default_resolver.set_address_rotation(enabled)
+
+def get_quarantined_addresses():
+    """
+    Return
+    -------
+    dict
+        Return quarantined addresses with their remaining quarantine period 
+        in seconds (``remaining``) and number of consecutive failures (``failures``)
+    """
+    return _default_resolver.get_quarantined_addresses()
+
+def set_address_rtt_scoring(enabled=True, exploration=0.05):
+    """Enable or disable RTT scoring of resolved addresses
+
+    If it's enabled (the default), connect RTT of every address is recorded 
+    as an exponentially weighted moving average. Addresses of a host that are 
+    as fast as the fastest one (within 50% or 5 milliseconds of it) 
+    and addresses that were never connected are still rotated,
+    clearly slower addresses are tried after them (within their address family).
+
+    On ``exploration`` fraction of connections RTT scores are ignored,
+    so the slower addresses are still measured and their scores stay current.
+
+    Parameters
+    -----------
+    enabled: :class:`bool`
+        If ``True``, the fastest addresses are tried first
+    exploration: :class:`float`
+        Probability of ignoring RTT scores on a connection, between 0 and 1
+
+    Raises
+    -------
+    ValueError
+        ``exploration`` is not between 0 and 1
+    """
+    _default_resolver.set_address_rtt_scoring(enabled, exploration)
+
+def get_address_stats():
+    """
+    Return
+    -------
+    dict
+        Return connected and quarantined addresses with their connect RTT 
+        moving average in seconds (``rtt``, ``None`` if it's not measured), 
+        number of RTT samples (``samples``), consecutive failures (``failures``) 
+        and remaining quarantine period in seconds (``quarantined``)
+    """
+    return _default_resolver.get_address_stats()
+
+def set_resolver_async_session(session):
+    """Set http session to resolve DNS asynchronously in current running event loop
+
+    If it's not set, the resolver creates one for each event loop and closes it
+    when the event loop is shutting down (like at the end of :func:`asyncio.run`).
+    Sessions set with this function are not closed by the resolver.
+
+    Parameters
+    -----------
+    session: :class:`httpx.AsyncClient`
+        An async http session to resolve DNS
+
+    Raises
+    -------
+    ValueError
+        ``session`` parameter is not :class:`httpx.AsyncClient` instance
+    RuntimeError
+        There is no running event loop
+    """
+    _default_resolver.set_async_session(session)
+
+def get_resolver_async_session():
+    """
+    Return
+    -------
+    httpx.AsyncClient
+        Return an async http session for DoH resolver in current running event loop
+    """
+    return _default_resolver.get_async_session()
 
 def set_dns_provider(provider):
     """Set a DoH provider, must be a valid DoH providers
-    
+
     Parameters
     -----------
     provider: :class:`str`
         An valid DoH provider, see :doc:`doh_providers`
 
+    This will disable DoH provider pool (see :func:`set_dns_provider_pool`)
+
     Raises
     -------
     DoHProviderNotExist
         Invalid DoH provider
     """
-    global _provider
-
-    if provider not in _available_providers.keys():
-        raise DoHProviderNotExist(f"invalid DoH provider, must be one of '{list(_available_providers.keys())}'")
-
-    _provider = _available_providers[provider]
+    _default_resolver.set_provider(provider)
 
 def get_dns_provider():
     """
     Return
     -------
     str
-        Return current DoH provider
+        Return current DoH provider,
+        if DoH provider pool is enabled the currently selected DoH provider is returned
+    """
+    return _default_resolver.get_provider()
+
+def set_dns_provider_pool(providers, failure_threshold=3, recovery_time=30, timeout=5.0):
+    """Use a pool of DoH providers
+
+    The resolver keeps rolling latency and error rate scores of each DoH provider
+    and sends queries to the best one. If a query failed to be sent
+    or the DoH provider answered with an error other than ``NXDOMAIN``
+    (like ``SERVFAIL`` or ``REFUSED``) or it didn't answer within ``timeout`` seconds, 
+    it will be retried with the next best DoH provider.
+
+    A DoH provider that fails ``failure_threshold`` times in a row is not used
+    for ``recovery_time`` seconds (circuit breaker),
+    after that a single probe query is sent to it to check whether it's recovered.
+
+    Parameters
+    -----------
+    providers: list[:class:`str`]
+        Valid DoH providers, see :doc:`doh_providers`.
+        If ``None``, the pool is disabled and active DoH provider is used again
+    failure_threshold: :class:`int`
+        Number of consecutive failures before a DoH provider is not used
+    recovery_time: :class:`float`
+        How long (in seconds) a failing DoH provider is not used
+    timeout: :class:`float`
+        How long (in seconds) to wait for a DoH provider to answer a query,
+        if ``None`` there is no timeout
+
+    Raises
+    -------
+    DoHProviderNotExist
+        Invalid DoH provider
+    """
+    _default_resolver.set_provider_pool(providers, failure_threshold, recovery_time, timeout)
+
+def get_dns_provider_pool_stats():
+    """
+    Return
+    -------
+    dict[str, dict]
+        Return rolling latency (in seconds), error rate and circuit breaker state
+        (``closed``, ``open`` or ``half-open``) of each DoH provider in the pool,
+        empty if DoH provider pool is disabled
     """
-    return _provider
+    return _default_resolver.get_provider_pool_stats()
 
-def add_dns_provider(name, address, switch=False):
+def add_dns_provider(name, address, switch=False, bootstrap_addresses=None):
     """Add a DoH provider
-    
+
     Parameters
     -----------
     name: :class:`str`
@@ -102,13 +1425,24 @@ def add_dns_provider(name, address, switch=False):
     address: :class:`str`
         Full URL / endpoint for DoH provider
     switch: Optional[:class:`bool`]
-        If ``True``, the DoH provider will automatically switch to 
+        If ``True``, the DoH provider will automatically switch to
         newly created DoH provider
-    """
-    _available_providers[name] = address
+    bootstrap_addresses: Optional[list[:class:`str`]]
+        IP addresses of the DoH provider hostname. If it's set, 
+        the resolver connects to these addresses directly instead of 
+        resolving the hostname with the system resolver. 
+        SNI and certificate are still validated against the hostname.
+        An empty list removes bootstrap addresses of the hostname 
+        (including built-in ones), so it's resolved with the system resolver again.
+        Only :class:`requests.Session` resolver sessions created by the resolver
+        (or set with ``bootstrap=True``) are supported
 
-    if switch:
-        set_dns_provider(name)
+    Raises
+    -------
+    ValueError
+        One of ``bootstrap_addresses`` is not an IP address
+    """
+    _default_resolver.add_provider(name, address, switch, bootstrap_addresses)
 
 def remove_dns_provider(name, fallback=None):
     """Remove a DoH provider
@@ -187,19 +1521,7 @@ def remove_dns_provider(name, fallback=None):
     DoHProviderNotExist
         DoH provider is not exist in list of available DoH providers
     """
-    global _provider
-
-    try:
-        _available_providers.pop(name)
-    except KeyError:
-        raise DoHProviderNotExist(
-            "DoH provider is not exist in list of available DoH providers"
-        )
-
-    if fallback:
-        set_dns_provider(fallback)
-    else:
-        _provider = None
+    _default_resolver.remove_provider(name, fallback)
 
 def get_all_dns_provider():
     """
@@ -208,50 +1530,108 @@ def get_all_dns_provider():
     tuple[str]
         Return all available DoH providers
     """
-    return tuple(_available_providers.keys())
+    return _default_resolver.get_all_providers()
 
-def _resolve(session, doh_endpoint, host, rdatatype):
-    req_message = make_query(host, rdatatype)
-    res_message = query_https(req_message, doh_endpoint, session=session)
-    rcode = Rcode(res_message.rcode())
-    if rcode != Rcode.NOERROR:
-        raise DNSQueryFailed(f"Failed to query DNS {rdatatype.name} from host '{host}' (rcode = {rcode.name}")
+def set_dns_hedging(provider, delay=None):
+    """Enable hedged DNS queries
 
-    answers = res_message.resolve_chaining().answer
-    if answers is None:
-        return None
+    If the active DoH provider doesn't answer a query within ``delay`` seconds,
+    the same query is sent to ``provider`` and whichever answers first is used.
+    The other query is cancelled if it hasn't been sent yet,
+    otherwise its answer is discarded.
+
+    Parameters
+    -----------
+    provider: :class:`str`
+        A valid DoH provider used for hedged queries, see :doc:`doh_providers`.
+        If ``None``, hedged queries are disabled (the default)
+    delay: :class:`float`
+        How long to wait for active DoH provider before sending hedged query.
+        If ``None``, 95th percentile of recent active DoH provider latencies is used
 
-    return tuple(str(i) for i in answers)
+    Raises
+    -------
+    DoHProviderNotExist
+        Invalid DoH provider
+    """
+    _default_resolver.set_hedging(provider, delay)
+
+def get_dns_hedging_stats():
+    """
+    Return
+    -------
+    dict
+        Return number of queries, number of hedged queries,
+        number of queries answered by hedged query first
+        and hedge rate (hedged queries / queries)
+    """
+    return _default_resolver.get_hedging_stats()
 
 def resolve_dns(host):
-    if _provider is None:
-        raise NoDoHProvider("There is no active DoH provider")
+    """Resolve ``host`` with DoH provider
+
+    Parameters
+    -----------
+    host: :class:`str`
+        A host want to be resolved
 
-    session = get_resolver_session()
+    Raises
+    -------
+    NoDoHProvider
+        There is no active DoH provider
+    DNSQueryFailed
+        Failed to query DNS from given host
 
-    if session is None:
-        session = requests.Session()
-        set_resolver_session(session)
+    Return
+    -------
+    list[str]
+        Resolved addresses of ``host``
+    """
+    return _default_resolver.resolve(host)
 
-    answers = set()
+async def resolve_dns_async(host):
+    """Resolve ``host`` with DoH provider asynchronously
 
-    # Reuse is good
-    def query(rdatatype):
-        return _resolve(session, _provider, host, rdatatype)
+    Unlike :func:`resolve_dns`, resolved answers are cached
+    and cached answers are returned without querying DoH provider.
+    Multiple tasks resolving the same host share one DoH query.
 
-    # Query A type
-    A_ANSWERS = query(RdataType.A)
-    if A_ANSWERS is not None:
-        answers.update(A_ANSWERS)
+    Parameters
+    -----------
+    host: :class:`str`
+        A host want to be resolved
 
-    # Query AAAA type
-    AAAA_ANSWERS = query(RdataType.AAAA)
-    if AAAA_ANSWERS is not None:
-        answers.update(AAAA_ANSWERS)
+    Raises
+    -------
+    NoDoHProvider
+        There is no active DoH provider
+    DNSQueryFailed
+        Failed to query DNS from given host
 
-    if not answers:
-        raise DNSQueryFailed(
-            f"DNS server {_provider} returned empty results from host '{host}'"
-        )
+    Return
+    -------
+    list[str]
+        Resolved addresses of ``host``
+    """
+    return await _default_resolver.resolve_async(host)
+
+def resolve_many(hosts, concurrency=8):
+    """Resolve many hosts at once with DoH provider
+
+    Duplicate hosts are resolved once and already cached hosts are not resolved again.
+    The rest are resolved concurrently and cached.
 
-    return list(answers)
\ No newline at end of file
+    Parameters
+    -----------
+    hosts: Iterable[:class:`str`]
+        Hosts want to be resolved
+    concurrency: :class:`int`
+        Maximum number of hosts resolved at the same time
+
+    Return
+    -------
+    dict[str, Union[list[str], Exception]]
+        Resolved addresses of each host,
+        or the exception raised while resolving it (such as :class:`DNSQueryFailed`)
+    """
+    return _default_resolver.resolve_many(hosts, concurrency)
@@ -10,8 +10,17 @@ class DNSOverHTTPSSession(requests.Session):
     -----------
     provider: :class:`str`
         A DoH provider
+    resolver: :class:`Resolver`
+        A DoH resolver, if it's ``None`` the default resolver will be used
     cache_expire_time: :class:`float`
-        Set DNS cache expire time
+        Maximum time in seconds DNS answers are cached,
+        see :func:`set_dns_cache_expire_time`
+    cache_file: :class:`str`
+        Store DNS cache in this file, see :func:`set_dns_cache_file`
+    happy_eyeballs: :class:`bool`
+        Enable Happy Eyeballs (RFC 8305) connection racing
+    happy_eyeballs_delay: :class:`float`
+        Delay in seconds between each staggered connection attempt
     """
     def __init__(self, *args, **kwargs):
         super().__init__()